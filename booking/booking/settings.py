@@ -17,6 +17,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "drf_yasg",
     "rest_framework",
     "rest_framework_simplejwt",
@@ -25,6 +26,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "rooms.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -54,6 +56,17 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "booking.wsgi.application"
 
+# Соединения живут между запросами (CONN_MAX_AGE) и проверяются перед
+# повторным использованием. DB_PGBOUNCER=True — режим для pgbouncer с
+# transaction pooling: без серверных курсоров и без startup-параметров,
+# statement_timeout тогда задаётся на роли (ALTER ROLE ... SET).
+DB_PGBOUNCER = config("DB_PGBOUNCER", default=False, cast=bool)
+DB_STATEMENT_TIMEOUT = config("DB_STATEMENT_TIMEOUT", default=30000, cast=int)
+
+DB_OPTIONS = {"connect_timeout": config("DB_CONNECT_TIMEOUT", default=5, cast=int)}
+if not DB_PGBOUNCER and DB_STATEMENT_TIMEOUT:
+    DB_OPTIONS["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT}"
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -62,11 +75,43 @@ DATABASES = {
         "PASSWORD": config("DB_PASSWORD"),
         "HOST": config("DB_HOST"),
         "PORT": config("DB_PORT"),
+        "CONN_MAX_AGE": config("DB_CONN_MAX_AGE", default=60, cast=int),
+        "CONN_HEALTH_CHECKS": config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool),
+        "DISABLE_SERVER_SIDE_CURSORS": DB_PGBOUNCER,
+        "OPTIONS": DB_OPTIONS,
     }
 }
 
 AUTH_USER_MODEL = "rooms.MyUser"
 
+# Локальная память для разработки и тестов, Redis — в продакшене
+REDIS_URL = config("REDIS_URL", default="")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+ROOMS_CACHE_ALIAS = config("ROOMS_CACHE_ALIAS", default="default")
+ROOMS_CACHE_TIMEOUT = config("ROOMS_CACHE_TIMEOUT", default=300, cast=int)
+# Сколько секунд держится холд на комнату до подтверждения брони
+ROOMS_HOLD_TTL = config("ROOMS_HOLD_TTL", default=600, cast=int)
+# Сколько секунд хранится ответ на POST с Idempotency-Key
+ROOMS_IDEMPOTENCY_TTL = config("ROOMS_IDEMPOTENCY_TTL", default=86400, cast=int)
+
+# Метрики запросов в формате Prometheus на /api/metrics/; если токен
+# задан, скрейпер передаёт его в заголовке Authorization: Bearer <token>
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -97,7 +142,11 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # rest framework
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "rooms.authentication.ClaimsJWTAuthentication",
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "rooms.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ],
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
@@ -108,4 +157,10 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    "TOKEN_OBTAIN_SERIALIZER": "rooms.serializers.ClaimsTokenObtainPairSerializer",
 }
+
+# 0 — пользователь целиком из claims токена, без запросов к базе;
+# > 0 — строка пользователя кэшируется на столько секунд и сбрасывается
+# при изменении, так отзыв прав и блокировка действуют сразу
+ROOMS_AUTH_USER_CACHE_TTL = config("ROOMS_AUTH_USER_CACHE_TTL", default=0, cast=int)
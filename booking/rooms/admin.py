@@ -1,6 +1,15 @@
 from django.contrib import admin
 
-from .models import Booking, Room
+from . import search
+from .models import (
+    Booking,
+    BookingArchive,
+    IdempotencyKey,
+    Job,
+    RatePlan,
+    Room,
+    StayDiscount,
+)
 
 
 @admin.register(Room)
@@ -9,6 +18,12 @@ class RoomAdmin(admin.ModelAdmin):
     list_filter = ("room_type",)
     search_fields = ("name", "room_type")
 
+    def get_search_results(self, request, queryset, search_term):
+        # Номера и начало типа, как в параметре q у API
+        if not search_term:
+            return queryset, False
+        return search.match(queryset, search_term), False
+
 
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
@@ -18,3 +33,57 @@ class BookingAdmin(admin.ModelAdmin):
         "room__room_type",
     )
     search_fields = ("user__username", "room__room_type")
+    list_select_related = ("user", "room")
+
+
+@admin.register(RatePlan)
+class RatePlanAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "name",
+        "room",
+        "room_type",
+        "start_date",
+        "end_date",
+        "price_per_day",
+        "weekend_surcharge",
+        "priority",
+    )
+    list_filter = ("room_type",)
+    list_select_related = ("room",)
+
+
+@admin.register(StayDiscount)
+class StayDiscountAdmin(admin.ModelAdmin):
+    list_display = ("id", "room_type", "min_nights", "percent")
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "kind",
+        "status",
+        "processed",
+        "total",
+        "created_at",
+        "heartbeat_at",
+        "finished_at",
+    )
+    list_filter = ("kind", "status")
+    readonly_fields = ("cursor", "processed", "total", "error", "started_at")
+
+
+@admin.register(BookingArchive)
+class BookingArchiveAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "room", "start_date", "end_date", "cost")
+    list_select_related = ("user", "room")
+    search_fields = ("user__username",)
+    date_hierarchy = "start_date"
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "key", "status_code", "created_at")
+    list_select_related = ("user",)
+    search_fields = ("user__username", "key")
@@ -0,0 +1,113 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import exceptions
+
+from . import occupancy
+from .authentication import ClaimsJWTAuthentication
+from .filters import RoomFilter
+from .models import Booking, Room
+from .rows import RowSerializer
+from .serializers import BookingSerializer, RoomSerializer, StayQuerySerializer
+
+# Асинхронные эндпоинты только на чтение: под ASGI запрос не держит поток,
+# пока ждёт базу. DRF async-представления не поддерживает, поэтому это
+# обычные Django views с тем же форматом ответа.
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def _page_params(request):
+    try:
+        limit = min(int(request.GET.get("limit", DEFAULT_LIMIT)), MAX_LIMIT)
+        after = int(request.GET.get("after", 0))
+    except ValueError:
+        return None
+    return max(limit, 1), after
+
+
+def _room_queryset(request):
+    # Даты разбирает room_availability через StayQuerySerializer
+    params = request.GET.copy()
+    params.pop("start_date", None)
+    params.pop("end_date", None)
+    room_filter = RoomFilter(params, queryset=Room.objects.all(), request=request)
+    if not room_filter.is_valid():
+        return None, room_filter.errors
+    return room_filter.qs, None
+
+
+async def _page(queryset, serializer_class, limit, after):
+    # Keyset-пагинация по id: глубокие страницы не дороже первой
+    rows = RowSerializer.for_serializer(serializer_class)
+    items = [
+        item
+        async for item in queryset.filter(id__gt=after)
+        .order_by("id")
+        .values(*rows.sources)[:limit]
+        .aiterator()
+    ]
+    return {
+        "next_after": items[-1]["id"] if len(items) == limit else None,
+        "results": rows.many(items),
+    }
+
+
+async def room_list(request):
+    page = _page_params(request)
+    queryset, errors = _room_queryset(request)
+    if page is None or errors:
+        return JsonResponse(errors or {"detail": "Invalid page"}, status=400)
+    return JsonResponse(await _page(queryset, RoomSerializer, *page))
+
+
+async def room_detail(request, pk):
+    room = await Room.objects.filter(pk=pk).afirst()
+    if room is None:
+        return JsonResponse({"detail": "Not found."}, status=404)
+    return JsonResponse(RoomSerializer(room).data)
+
+
+async def room_availability(request):
+    page = _page_params(request)
+    queryset, errors = _room_queryset(request)
+    query = StayQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        errors = {**(errors or {}), **query.errors}
+    if page is None or errors:
+        return JsonResponse(errors or {"detail": "Invalid page"}, status=400)
+
+    start_date = query.validated_data["start_date"]
+    end_date = query.validated_data["end_date"]
+    room_id = request.GET.get("room")
+    if room_id:
+        if not room_id.isdigit():
+            return JsonResponse({"room": ["A valid integer is required."]}, status=400)
+        if not await Room.objects.filter(pk=room_id).aexists():
+            return JsonResponse({"detail": "Not found."}, status=404)
+        booked = await occupancy.awindow_bitsets(start_date, end_date, [room_id])
+        return JsonResponse({"room": int(room_id), "available": not booked})
+
+    # Тот же анти-join, что и в RoomFilter: без списка занятых id в запросе
+    return JsonResponse(
+        await _page(queryset.available(start_date, end_date), RoomSerializer, *page)
+    )
+
+
+async def my_bookings(request):
+    try:
+        auth = await sync_to_async(ClaimsJWTAuthentication().authenticate)(request)
+    except exceptions.AuthenticationFailed as exc:
+        return JsonResponse({"detail": str(exc.detail)}, status=401)
+    if auth is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."}, status=401
+        )
+
+    page = _page_params(request)
+    if page is None:
+        return JsonResponse({"detail": "Invalid page"}, status=400)
+    user = auth[0]
+    return JsonResponse(
+        await _page(Booking.objects.filter(user=user.id), BookingSerializer, *page)
+    )
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import cache
+from .models import MyUser
+
+# Права проверяются только по id, username, is_staff и is_superuser, а они
+# есть в подписанном токене. По умолчанию пользователь строится из claims
+# без запроса к базе; права, отозванные после выдачи токена, тогда действуют
+# до его истечения. ROOMS_AUTH_USER_CACHE_TTL > 0 включает проверку по
+# строке пользователя из кэша, которая сбрасывается при каждом изменении.
+
+USER_KEY = "rooms:auth:user:{}"
+USER_FIELDS = ("id", "username", "is_staff", "is_superuser", "is_active")
+CLAIMS = ("username", "is_staff", "is_superuser")
+
+
+class ClaimsRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        # Access-токен, выпущенный из refresh, копирует эти claims
+        for claim in CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+def _user_row(user_id, ttl):
+    store = cache.get_cache()
+    key = USER_KEY.format(user_id)
+    row = store.get(key)
+    if row is None:
+        row = MyUser.objects.filter(id=user_id).values(*USER_FIELDS).first()
+        if row is None:
+            return None
+        store.set(key, row, ttl)
+    return row
+
+
+def invalidate_user(user_id):
+    key = USER_KEY.format(user_id)
+    cache.get_cache().delete(key)
+    transaction.on_commit(lambda: cache.get_cache().delete(key))
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    def get_user(self, validated_token):
+        ttl = settings.ROOMS_AUTH_USER_CACHE_TTL
+        if not ttl:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        row = _user_row(user_id, ttl)
+        if row is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not row["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return TokenUser({api_settings.USER_ID_CLAIM: row["id"], **row})
@@ -0,0 +1,96 @@
+import base64
+
+from django.db.backends.postgresql.psycopg_any import DateRange
+
+from . import occupancy
+from .models import Booking
+
+
+def stay_range(start_date, end_date):
+    # Те же границы, что и у Booking.period: ночь выезда не занята
+    return DateRange(start_date, end_date)
+
+
+def overlapping_bookings(start_date, end_date):
+    return Booking.objects.filter(period__overlap=stay_range(start_date, end_date))
+
+
+def booked_room_ids(start_date, end_date):
+    # Проверки свободных дат идут по карте занятости, а не по таблице броней
+    return list(occupancy.window_bitsets(start_date, end_date))
+
+
+def is_room_available(room_id, start_date, end_date):
+    return not occupancy.window_bitsets(start_date, end_date, [room_id])
+
+
+def find_conflicts(stays):
+    # stays — список (room_id, start_date, end_date); возвращает индексы тех,
+    # что пересекаются с существующими бронями или с предыдущими из того же списка
+    if not stays:
+        return set()
+
+    taken = {}
+    rows = overlapping_bookings(
+        min(start for _, start, _ in stays), max(end for _, _, end in stays)
+    ).filter(room_id__in={room_id for room_id, _, _ in stays})
+    for room_id, start, end in rows.values_list("room_id", "start_date", "end_date"):
+        taken.setdefault(room_id, []).append((start, end))
+
+    conflicts = set()
+    for index, (room_id, start, end) in enumerate(stays):
+        intervals = taken.setdefault(room_id, [])
+        if any(
+            start < busy_end and busy_start < end for busy_start, busy_end in intervals
+        ):
+            conflicts.add(index)
+        else:
+            intervals.append((start, end))
+    return conflicts
+
+
+def occupancy_bitsets(room_ids, start_date, end_date):
+    # Бит i у комнаты — занята ночь start_date + i
+    bitsets = dict.fromkeys(room_ids, 0)
+    bitsets.update(occupancy.window_bitsets(start_date, end_date, room_ids))
+    return bitsets
+
+
+def bits_to_spans(bits):
+    # Занятые ночи как пары [смещение, длина]
+    spans = []
+    offset = 0
+    while bits:
+        zeros = (bits & -bits).bit_length() - 1
+        bits >>= zeros
+        offset += zeros
+        ones = (bits ^ (bits + 1)).bit_length() - 1
+        spans.append([offset, ones])
+        bits >>= ones
+        offset += ones
+    return spans
+
+
+def bits_to_bitmap(bits, days):
+    # Ночь i — бит i % 8 в байте i // 8, результат в base64
+    return base64.b64encode(bits.to_bytes((days + 7) // 8, "little")).decode()
+
+
+def free_starts(bits, days, nights):
+    # Бит i результата — свободны все ночи i .. i + nights - 1. Скользящее
+    # окно по битам: OR сдвигов с удвоением шага, log(nights) операций
+    busy = bits
+    width = 1
+    while width < nights:
+        step = min(width, nights - width)
+        busy |= busy >> step
+        width += step
+    return ~busy & ((1 << (days - nights + 1)) - 1)
+
+
+def iter_bits(bits):
+    # Номера установленных битов по возрастанию
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
@@ -0,0 +1,159 @@
+import math
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from . import occupancy
+from .models import Booking, MyUser, Room, RoomOccupancy
+
+
+def measure(fn, repeat=20, warmup=2, clock=time.perf_counter):
+    # clock=time.process_time — только CPU этого процесса, без ожидания базы
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = clock()
+        fn()
+        samples.append(clock() - started)
+    return samples
+
+
+def percentile(ordered, pct):
+    # Ближайший ранг: p99 из 100 замеров — 99-й по величине
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "min_ms": ordered[0] * 1000,
+        "median_ms": statistics.median(ordered) * 1000,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def seed(rooms, bookings, start=date(2020, 1, 1), batch_size=5000, rnd=None):
+    # Генерирует непересекающиеся брони: у каждой комнаты своя цепочка заездов
+    rnd = rnd or random.Random(0)
+    user, _ = MyUser.objects.get_or_create(
+        username="bench", defaults={"email": "bench@example.com"}
+    )
+    created_rooms = Room.objects.bulk_create(
+        [
+            Room(
+                name=i % 32000,
+                price_per_day=Decimal(rnd.randrange(50, 500)),
+                capacity=rnd.randint(1, 6),
+                room_type=rnd.choice([c for c, _ in Room.ROOM_TYPE_CHOICES]),
+            )
+            for i in range(rooms)
+        ],
+        batch_size=batch_size,
+    )
+    cursors = {room.id: start for room in created_rooms}
+    batch = []
+    for i in range(bookings):
+        room = created_rooms[i % len(created_rooms)]
+        check_in = cursors[room.id] + timedelta(days=rnd.randint(0, 3))
+        check_out = check_in + timedelta(days=rnd.randint(1, 7))
+        cursors[room.id] = check_out
+        batch.append(
+            Booking(
+                user=user,
+                room=room,
+                start_date=check_in,
+                end_date=check_out,
+                cost=(check_out - check_in).days * room.price_per_day,
+            )
+        )
+        if len(batch) >= batch_size:
+            Booking.objects.bulk_create(batch)
+            batch = []
+    Booking.objects.bulk_create(batch)
+    occupancy.rebuild()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {Room._meta.db_table}")
+        cursor.execute(f"ANALYZE {Booking._meta.db_table}")
+    return created_rooms
+
+
+def generate(rooms, users, bookings, start=date(2020, 1, 1), prefix="load"):
+    # То же, что seed(), но целиком в SQL: миллионы строк за минуты.
+    # Брони комнаты идут неделя за неделей (1-5 ночей), поэтому не
+    # пересекаются; гости и длительность — детерминированный хэш от номера
+    stays_per_room = math.ceil(bookings / rooms)
+    user_table = MyUser._meta.db_table
+    room_table = Room._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SET LOCAL statement_timeout = 0")
+        cursor.execute(f"SELECT coalesce(max(id), 0) FROM {user_table}")
+        last_user = cursor.fetchone()[0]
+        cursor.execute(
+            f"""
+            INSERT INTO {user_table} (password, is_superuser, username, first_name,
+                last_name, email, is_staff, is_active, date_joined)
+            SELECT '!', false, %(prefix)s || g, '', '', %(prefix)s || g || '@example.com',
+                false, true, now()
+            FROM generate_series(1, %(users)s) g
+            """,
+            {"prefix": prefix, "users": users},
+        )
+        # Значения последовательности идут подряд, но не обязательно с max + 1
+        cursor.execute(f"SELECT min(id) FROM {user_table} WHERE id > %s", [last_user])
+        first_user = cursor.fetchone()[0]
+        cursor.execute(f"SELECT coalesce(max(id), 0) FROM {room_table}")
+        last_room = cursor.fetchone()[0]
+        cursor.execute(
+            f"""
+            INSERT INTO {room_table} (name, price_per_day, capacity, room_type)
+            SELECT g %% 32000, 50 + (g * 7919) %% 450, 1 + (g * 31) %% 6,
+                (ARRAY['standard', 'deluxe', 'suite'])[1 + g %% 3]
+            FROM generate_series(1, %(rooms)s) g
+            """,
+            {"rooms": rooms},
+        )
+        cursor.execute(f"SELECT min(id) FROM {room_table} WHERE id > %s", [last_room])
+        first_room = cursor.fetchone()[0]
+        cursor.execute(
+            f"""
+            INSERT INTO {Booking._meta.db_table} (user_id, room_id, start_date,
+                end_date, cost)
+            SELECT u.id, r.id, s.start_date, s.start_date + s.nights,
+                s.nights * r.price_per_day
+            FROM {room_table} r
+            CROSS JOIN generate_series(0, %(stays)s - 1) k
+            CROSS JOIN LATERAL (
+                SELECT %(start)s::date + (k * 7 + r.id %% 2)::int AS start_date,
+                    (1 + (r.id * 31 + k * 17) %% 5)::int AS nights
+            ) s
+            CROSS JOIN LATERAL (
+                SELECT %(first_user)s + (r.id * 7919 + k * 104729) %% %(users)s AS id
+            ) u
+            WHERE r.id >= %(first_room)s
+                AND (r.id - %(first_room)s) * %(stays)s + k < %(bookings)s
+            """,
+            {
+                "stays": stays_per_room,
+                "start": start,
+                "first_user": first_user,
+                "users": users,
+                "first_room": first_room,
+                "bookings": bookings,
+            },
+        )
+    occupancy.rebuild()
+
+    with connection.cursor() as cursor:
+        for model in (MyUser, Room, Booking, RoomOccupancy):
+            cursor.execute(f"ANALYZE {model._meta.db_table}")
@@ -0,0 +1,126 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOGUE_VERSION = "rooms:version:catalogue"
+BOOKINGS_VERSION = "rooms:version:bookings"
+PRICING_VERSION = "rooms:version:pricing"
+HITS = "rooms:stats:hits"
+MISSES = "rooms:stats:misses"
+
+DATE_PARAMS = ("start_date", "end_date")
+
+
+def get_cache():
+    return caches[settings.ROOMS_CACHE_ALIAS]
+
+
+def current_version(key):
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        # Начинаем не с 1, иначе после вытеснения ключа версия повторится
+        # и старые записи снова станут «свежими»
+        version = time.time_ns()
+        cache.add(key, version, timeout=None)
+        version = cache.get(key, version)
+    return version
+
+
+def _incr(key, initial):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, initial, timeout=None)
+
+
+def _invalidate(key):
+    _incr(key, time.time_ns())
+    # Повторно после коммита: иначе параллельный запрос может успеть
+    # закэшировать ещё не закоммиченное состояние
+    transaction.on_commit(lambda: _incr(key, time.time_ns()))
+
+
+def invalidate_catalogue():
+    _invalidate(CATALOGUE_VERSION)
+
+
+def invalidate_bookings():
+    _invalidate(BOOKINGS_VERSION)
+
+
+def invalidate_pricing():
+    _invalidate(PRICING_VERSION)
+
+
+def normalize_params(query_params):
+    items = []
+    for name in sorted(query_params):
+        values = sorted(v.strip() for v in query_params.getlist(name) if v.strip())
+        if name == "ordering":
+            values = [
+                ",".join(f.strip() for f in v.split(",") if f.strip()) for v in values
+            ]
+        items.extend((name, value) for value in values)
+    return urlencode(items)
+
+
+def make_key(request, kind):
+    params = normalize_params(request.query_params)
+    parts = [kind, str(current_version(CATALOGUE_VERSION))]
+    # Свободные на даты комнаты зависят ещё и от броней
+    if any(request.query_params.get(name) for name in DATE_PARAMS):
+        parts.append(str(current_version(BOOKINGS_VERSION)))
+    raw = f"{request.get_host()}{request.path}?{params}"
+    parts.append(hashlib.md5(raw.encode()).hexdigest())
+    return "rooms:" + ":".join(parts)
+
+
+def cached_response(request, kind, view):
+    cache = get_cache()
+    key = make_key(request, kind)
+    data = cache.get(key)
+    if data is not None:
+        _incr(HITS, 1)
+        return Response(data)
+
+    _incr(MISSES, 1)
+    response = view()
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(key, response.data, settings.ROOMS_CACHE_TIMEOUT)
+    return response
+
+
+def cached_value(kind, params, compute):
+    # Значение, которое зависит только от каталога комнат (не от броней)
+    cache = get_cache()
+    raw = normalize_params(params)
+    key = ":".join(
+        [
+            "rooms",
+            kind,
+            str(current_version(CATALOGUE_VERSION)),
+            hashlib.md5(raw.encode()).hexdigest(),
+        ]
+    )
+    value = cache.get(key)
+    if value is not None:
+        _incr(HITS, 1)
+        return value
+
+    _incr(MISSES, 1)
+    value = compute()
+    cache.set(key, value, settings.ROOMS_CACHE_TIMEOUT)
+    return value
+
+
+def stats():
+    counters = get_cache().get_many([HITS, MISSES])
+    return {"hits": counters.get(HITS, 0), "misses": counters.get(MISSES, 0)}
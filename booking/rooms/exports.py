@@ -0,0 +1,37 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Те же имена полей, что и у BookingSerializer
+BOOKING_FIELDS = ("id", "user", "room", "start_date", "end_date", "cost")
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    # csv.writer пишет сюда строку и сразу получает её обратно
+    def write(self, value):
+        return value
+
+
+def _rows(queryset, fields):
+    # values() и серверный курсор: в памяти только текущая пачка строк
+    return queryset.order_by("id").values(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+def stream_csv(queryset, fields=BOOKING_FIELDS):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in _rows(queryset, fields):
+        yield writer.writerow(["" if row[f] is None else row[f] for f in fields])
+
+
+def stream_ndjson(queryset, fields=BOOKING_FIELDS):
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for row in _rows(queryset, fields):
+        yield encoder.encode(row) + "\n"
+
+
+FORMATS = {
+    "csv": (stream_csv, "text/csv", "csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson", "ndjson"),
+}
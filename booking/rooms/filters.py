@@ -1,13 +1,14 @@
-from django.db.models import Q
 from django_filters import rest_framework as filters
 
-from .models import Booking, Room
+from . import search
+from .models import Room
 
 
 class RoomFilter(filters.FilterSet):
     start_date = filters.DateFilter(field_name="start_date", method="filter_by_date")
     end_date = filters.DateFilter(field_name="end_date", method="filter_by_date")
-    room_name = filters.CharFilter(field_name="name", method="filter_by_room_number")
+    room_name = filters.NumberFilter(field_name="name")
+    q = filters.CharFilter(method="filter_by_text")
 
     class Meta:
         model = Room
@@ -21,30 +22,18 @@ class RoomFilter(filters.FilterSet):
         ]
 
     def filter_by_date(self, queryset, name, value):
-        start_date = self.request.query_params.get("start_date")
-        end_date = self.request.query_params.get("end_date")
-        room_name = self.request.query_params.get("room_name")
-
-        if room_name and start_date and end_date:
-            # Проверяем конкретную комнату
-            is_available = not Booking.objects.filter(
-                room_name=room_name,
-                start_date__lt=end_date,
-                end_date__gt=start_date,
-            ).exists()
-            return (
-                Room.objects.filter(id=room_name)
-                if is_available
-                else Room.objects.none()
-            )
+        # Метод повешен на оба поля, интервал достаточно применить один раз
+        if name != "start_date":
+            return queryset
 
+        start_date = self.form.cleaned_data.get("start_date")
+        end_date = self.form.cleaned_data.get("end_date")
         if start_date and end_date:
-            # Получаем комнаты, которые забронированы в указанный интервал
-            booked_rooms = Booking.objects.filter(
-                Q(start_date__lt=end_date) & Q(end_date__gt=start_date)
-            ).values_list("room_id", flat=True)
-
-            # Исключаем забронированные комнаты из общего списка
-            queryset = queryset.exclude(id__in=booked_rooms)
+            # Условие в том же запросе: сочетается с остальными фильтрами,
+            # сортировкой и пагинацией
+            queryset = queryset.available(start_date, end_date)
 
         return queryset
+
+    def filter_by_text(self, queryset, name, value):
+        return search.match(queryset, value)
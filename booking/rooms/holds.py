@@ -0,0 +1,77 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import availability, cache
+
+# Холд — короткая резервация (комната, ночи) в кэше. Каждая ночь — отдельный
+# ключ, который занимается через add (SET NX в Redis): из одновременных
+# заявок ночь достаётся ровно одной, остальные получают отказ сразу, не
+# доходя до базы. Истекают холды сами, по TTL ключей.
+
+HOLD_KEY = "rooms:hold:{}"
+NIGHT_KEY = "rooms:hold:night:{}:{}"
+
+
+class HoldConflict(Exception):
+    pass
+
+
+def _night_keys(room_id, start_date, end_date):
+    return [
+        NIGHT_KEY.format(room_id, (start_date + timedelta(days=i)).isoformat())
+        for i in range((end_date - start_date).days)
+    ]
+
+
+def _owner(hold):
+    return f"{hold['user']}:{hold['id']}"
+
+
+def _release_nights(store, keys, owner):
+    # Удаляем только свои ночи: чужой холд мог занять ключ после истечения
+    current = store.get_many(keys)
+    store.delete_many([key for key in keys if current.get(key) == owner])
+
+
+def place(user_id, room_id, start_date, end_date):
+    if not availability.is_room_available(room_id, start_date, end_date):
+        raise HoldConflict("Room is already booked for the specified dates")
+
+    ttl = settings.ROOMS_HOLD_TTL
+    store = cache.get_cache()
+    hold = {
+        "id": uuid.uuid4().hex,
+        "user": user_id,
+        "room": room_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "expires_at": timezone.now() + timedelta(seconds=ttl),
+    }
+    owner = _owner(hold)
+    taken = []
+    for key in _night_keys(room_id, start_date, end_date):
+        if not store.add(key, owner, ttl):
+            _release_nights(store, taken, owner)
+            raise HoldConflict("Room is on hold for the specified dates")
+        taken.append(key)
+    store.set(HOLD_KEY.format(hold["id"]), hold, ttl)
+    return hold
+
+
+def get(hold_id):
+    return cache.get_cache().get(HOLD_KEY.format(hold_id))
+
+
+def release(hold):
+    store = cache.get_cache()
+    keys = _night_keys(hold["room"], hold["start_date"], hold["end_date"])
+    _release_nights(store, keys, _owner(hold))
+    store.delete(HOLD_KEY.format(hold["id"]))
+
+
+def held_by_others(room_id, start_date, end_date, user_id):
+    held = cache.get_cache().get_many(_night_keys(room_id, start_date, end_date))
+    return any(not owner.startswith(f"{user_id}:") for owner in held.values())
@@ -0,0 +1,120 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+# Повтор POST с тем же Idempotency-Key получает сохранённый ответ за один
+# запрос к базе, без валидации и попытки вставки. Ключи живут
+# ROOMS_IDEMPOTENCY_TTL секунд, старые удаляет purge_idempotency_keys.
+
+HEADER = "Idempotency-Key"
+MAX_LENGTH = 255
+# Запрос, не завершившийся за это время, считаем оборванным: ключ можно занять
+STALE_AFTER = timedelta(minutes=1)
+
+
+def fingerprint(request):
+    data = request.data
+    if hasattr(data, "lists"):
+        data = dict(data.lists())
+    body = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(
+        f"{request.method} {request.path}\n{body}".encode()
+    ).hexdigest()
+
+
+def _claim(user_id, key, digest):
+    # (запись, True), если запрос выполняем мы; (запись, False) — если ключ
+    # уже занят и нужно ответить из записи
+    now = timezone.now()
+    record = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+    if record is None:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user_id=user_id, key=key, fingerprint=digest, created_at=now
+                )
+            return record, True
+        except IntegrityError:
+            # Параллельный запрос с тем же ключом вставил запись раньше
+            return IdempotencyKey.objects.get(user_id=user_id, key=key), False
+
+    expired = record.created_at < now - timedelta(
+        seconds=settings.ROOMS_IDEMPOTENCY_TTL
+    )
+    stale = record.status_code is None and record.created_at < now - STALE_AFTER
+    if not (expired or stale):
+        return record, False
+    # Условный UPDATE: из одновременных повторов запись занимает один
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, created_at=record.created_at
+    ).update(fingerprint=digest, status_code=None, response=None, created_at=now)
+    if not taken:
+        return IdempotencyKey.objects.get(pk=record.pk), False
+    record.fingerprint, record.status_code, record.response = digest, None, None
+    record.created_at = now
+    return record, True
+
+
+def respond(request, handler):
+    # handler — обычная обработка запроса, вызывается не больше раза на ключ
+    key = request.headers.get(HEADER)
+    if key is None or not request.user.is_authenticated:
+        return handler()
+    if not 0 < len(key) <= MAX_LENGTH:
+        return Response(
+            {"detail": f"{HEADER} must be 1 to {MAX_LENGTH} characters long"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    digest = fingerprint(request)
+    record, owner = _claim(request.user.id, key, digest)
+    if not owner:
+        if record.fingerprint != digest:
+            return Response(
+                {"detail": f"{HEADER} was already used for a different request"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if record.status_code is None:
+            return Response(
+                {"detail": f"A request with this {HEADER} is still in progress"},
+                status=status.HTTP_409_CONFLICT,
+                headers={"Retry-After": "1"},
+            )
+        response = Response(record.response, status=record.status_code)
+        response["Idempotent-Replayed"] = "true"
+        return response
+
+    try:
+        response = handler()
+    except Exception:
+        # В том числе ошибка валидации: ключ освобождается, повтор выполнится
+        record.delete()
+        raise
+    # Ошибку сервера повтор должен выполнить заново, а не получить копию
+    if response.status_code >= 500:
+        record.delete()
+    else:
+        record.status_code = response.status_code
+        record.response = response.data
+        record.save(update_fields=["status_code", "response"])
+    return response
+
+
+def purge(before, chunk_size=1000):
+    # Одна пачка ключей, созданных раньше before
+    ids = list(
+        IdempotencyKey.objects.filter(created_at__lt=before)
+        .order_by("created_at")
+        .values_list("id", flat=True)[:chunk_size]
+    )
+    IdempotencyKey.objects.filter(id__in=ids).delete()
+    return len(ids)
@@ -0,0 +1,166 @@
+import time
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import cache, occupancy, pricing
+from .models import Booking, Job, Room
+
+# Очередь задач в самой базе, без брокера. Задача обрабатывает строки
+# пачками по возрастанию id; пачка и продвижение курсора коммитятся вместе,
+# поэтому после падения воркера задача продолжается с того же места.
+
+# Задачу с таким старым heartbeat считаем брошенной упавшим воркером
+STALE_AFTER = timedelta(minutes=5)
+
+
+class RecomputeCosts:
+    # Пересчёт cost будущих броней после смены цены комнаты или тарифов
+    def queryset(self, params):
+        bookings = Booking.objects.filter(
+            start_date__gte=params.get("since") or timezone.now().date()
+        )
+        if params.get("room"):
+            bookings = bookings.filter(room_id=params["room"])
+        if params.get("room_type"):
+            bookings = bookings.filter(room__room_type=params["room_type"])
+        return bookings
+
+    def process(self, ids, params):
+        bookings = list(
+            Booking.objects.filter(id__in=ids).select_related("room").order_by("id")
+        )
+        costs = pricing.quote_many(
+            [(b.room, b.start_date, b.end_date) for b in bookings]
+        )
+        changed = []
+        for booking, cost in zip(bookings, costs):
+            if booking.cost != cost:
+                booking.cost = cost
+                changed.append(booking)
+        Booking.objects.bulk_update(changed, ["cost"])
+
+
+class PurgeBookings:
+    # Удаление броней, закончившихся раньше params["before"]
+    def queryset(self, params):
+        return Booking.objects.filter(end_date__lt=params["before"])
+
+    def process(self, ids, params):
+        stays = list(
+            Booking.objects.filter(id__in=ids).values_list(
+                "room_id", "start_date", "end_date"
+            )
+        )
+        # Без delete() модели: сигналы освобождали бы карту по одной брони,
+        # а здесь — одним вызовом на всю пачку
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {Booking._meta.db_table} WHERE id = ANY(%s)", [ids]
+            )
+        occupancy.release(stays)
+        cache.invalidate_bookings()
+
+
+class RebuildOccupancy:
+    # То же, что rebuild_occupancy, но по частям и без LOCK TABLE
+    def queryset(self, params):
+        return Room.objects.all()
+
+    def process(self, ids, params):
+        occupancy.rebuild_rooms(ids)
+
+
+HANDLERS = {
+    Job.RECOMPUTE_COSTS: RecomputeCosts(),
+    Job.PURGE_BOOKINGS: PurgeBookings(),
+    Job.REBUILD_OCCUPANCY: RebuildOccupancy(),
+}
+
+
+def _json_params(params):
+    return {
+        key: value.isoformat() if isinstance(value, date) else value
+        for key, value in params.items()
+    }
+
+
+def enqueue(kind, **params):
+    # Такая же задача ещё ждёт в очереди — вторая не нужна
+    params = _json_params(params)
+    job = Job.objects.filter(kind=kind, params=params, status=Job.QUEUED).first()
+    return job or Job.objects.create(kind=kind, params=params)
+
+
+def claim():
+    stale = timezone.now() - STALE_AFTER
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=Job.QUEUED) | Q(status=Job.RUNNING, heartbeat_at__lt=stale)
+            )
+            .order_by("id")
+            .first()
+        )
+        if job is None:
+            return None
+        now = timezone.now()
+        job.status = Job.RUNNING
+        job.started_at = job.started_at or now
+        job.heartbeat_at = now
+        job.save(update_fields=["status", "started_at", "heartbeat_at"])
+    return job
+
+
+def run(job, chunk_size=500, pause=0.1, duty_cycle=0.5, log=None):
+    # Между пачками воркер спит не меньше pause и так, чтобы работа занимала
+    # не больше duty_cycle времени: живые запросы успевают к базе
+    handler = HANDLERS[job.kind]
+    queryset = handler.queryset(job.params)
+    if job.total is None:
+        job.total = queryset.count()
+        job.save(update_fields=["total"])
+
+    try:
+        while True:
+            started = time.perf_counter()
+            with transaction.atomic():
+                ids = list(
+                    queryset.filter(id__gt=job.cursor)
+                    .order_by("id")
+                    .values_list("id", flat=True)[:chunk_size]
+                )
+                if ids:
+                    handler.process(ids, job.params)
+                    job.cursor = ids[-1]
+                    job.processed += len(ids)
+                job.heartbeat_at = timezone.now()
+                if len(ids) < chunk_size:
+                    job.status = Job.DONE
+                    job.finished_at = job.heartbeat_at
+                job.save()
+            if log:
+                log(job)
+            if job.status == Job.DONE:
+                return job
+            elapsed = time.perf_counter() - started
+            time.sleep(max(pause, elapsed * (1 - duty_cycle) / duty_cycle))
+    except KeyboardInterrupt:
+        # Остановка воркера: задача вернётся в очередь и продолжится с курсора
+        Job.objects.filter(pk=job.pk).update(status=Job.QUEUED)
+        raise
+    except Exception as exc:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, error=repr(exc), finished_at=timezone.now()
+        )
+        raise
+
+
+def retry(job):
+    # Упавшая задача продолжается с сохранённого курсора
+    Job.objects.filter(pk=job.pk, status=Job.FAILED).update(
+        status=Job.QUEUED, error="", finished_at=None
+    )
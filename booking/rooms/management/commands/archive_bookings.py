@@ -0,0 +1,42 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rooms.archive import archive_chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Move completed stays from the bookings table into the archive. "
+        "Run VACUUM (ANALYZE) on rooms_booking after large runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before",
+            type=date.fromisoformat,
+            help="Archive stays that ended on or before this date (default: "
+            "--keep-days ago)",
+        )
+        parser.add_argument("--keep-days", type=int, default=30)
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause", type=float, default=0.1, help="Sleep between chunks"
+        )
+
+    def handle(self, *args, **options):
+        before = options["before"] or date.today() - timedelta(
+            days=options["keep_days"]
+        )
+        if before > date.today():
+            raise CommandError(f"--before {before} is in the future")
+        total = 0
+        while True:
+            moved = archive_chunk(before, options["chunk_size"])
+            total += moved
+            if moved < options["chunk_size"]:
+                break
+            self.stdout.write(f"Archived {total} bookings so far")
+            time.sleep(options["pause"])
+        self.stdout.write(f"Archived {total} bookings that ended by {before}")
@@ -0,0 +1,252 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.db.models import Max, Min
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from rooms.benchmarks import summarize
+from rooms.models import Booking, MyUser, Room
+
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+SCENARIOS = ("room_search", "availability", "booking_contention", "staff_listing")
+
+
+class Command(BaseCommand):
+    help = (
+        "Run load scenarios against the booking API, print p50/p95/p99 and "
+        "throughput, save or compare a JSON baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario", action="append", choices=SCENARIOS, dest="scenarios"
+        )
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument(
+            "--hot-rooms",
+            type=int,
+            default=5,
+            help="Rooms the booking_contention scenario competes for",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--with-cache", action="store_true")
+        parser.add_argument("--output", help="Write the results as a JSON baseline")
+        parser.add_argument("--compare", help="Baseline JSON to compare against")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed p95 growth / throughput drop before failing (0.2 = 20%%)",
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        self.rnd = random.Random(options["seed"])
+        self.prepare(options)
+
+        results = {}
+        caches = None if options["with_cache"] else NO_CACHE
+        with override_settings(**({"CACHES": caches} if caches else {})):
+            for name in options["scenarios"] or SCENARIOS:
+                scenario = getattr(self, name)(options)
+                try:
+                    results[name] = self.run(scenario, options)
+                finally:
+                    scenario.cleanup()
+                self.report(name, results[name])
+
+        baseline = {
+            "created": timezone.now().isoformat(),
+            "dataset": self.dataset,
+            "options": {
+                key: options[key]
+                for key in ("requests", "concurrency", "users", "hot_rooms", "seed")
+            },
+            "scenarios": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(baseline, f, indent=2)
+            self.stdout.write(f"Baseline written to {options['output']}")
+        if options["compare"]:
+            self.compare(baseline, options["compare"], options["tolerance"])
+
+    def prepare(self, options):
+        span = Booking.objects.aggregate(first=Min("start_date"), last=Max("end_date"))
+        today = timezone.now().date()
+        self.first_day = span["first"] or today
+        self.last_day = span["last"] or today + timedelta(days=365)
+        self.dataset = {
+            "rooms": Room.objects.count(),
+            "bookings": Booking.objects.count(),
+            "users": MyUser.objects.count(),
+        }
+        if not self.dataset["rooms"]:
+            raise CommandError("No rooms, seed data first (seed_load_data)")
+
+        users = list(
+            MyUser.objects.filter(is_staff=False).order_by("id")[: options["users"]]
+        )
+        if not users:
+            raise CommandError("No regular users to book with")
+        self.users = [(user.id, self.auth(user)) for user in users]
+        staff, _ = MyUser.objects.get_or_create(
+            username="bench-staff",
+            defaults={"email": "bench-staff@example.com", "is_staff": True},
+        )
+        self.staff = self.auth(staff)
+        self.stdout.write(
+            "dataset: "
+            + ", ".join(f"{key}={value}" for key, value in self.dataset.items())
+        )
+
+    @staticmethod
+    def auth(user):
+        token = RefreshToken.for_user(user).access_token
+        return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def stay(self):
+        # Случайный заезд на 1-7 ночей внутри периода, где есть брони
+        days = max((self.last_day - self.first_day).days - 7, 1)
+        start = self.first_day + timedelta(days=self.rnd.randrange(days))
+        end = start + timedelta(days=self.rnd.randint(1, 7))
+        return {"start_date": start.isoformat(), "end_date": end.isoformat()}
+
+    def room_search(self, options):
+        def call(client):
+            params = dict(self.stay(), capacity=self.rnd.randint(1, 6))
+            return client.get("/api/rooms/search/", params)
+
+        return Scenario(call)
+
+    def availability(self, options):
+        def call(client):
+            params = dict(self.stay(), capacity=self.rnd.randint(1, 6), page_size=50)
+            return client.get("/api/rooms/", params)
+
+        return Scenario(call)
+
+    def booking_contention(self, options):
+        # Все потоки бьются за несколько комнат и пересекающиеся даты после
+        # последней брони: выигрывает одна заявка, остальные получают 400
+        rooms = list(
+            Room.objects.order_by("id").values_list("id", flat=True)[
+                : options["hot_rooms"]
+            ]
+        )
+        first = self.last_day + timedelta(days=30)
+
+        def call(client):
+            user_id, headers = self.rnd.choice(self.users)
+            start = first + timedelta(days=self.rnd.randrange(14))
+            data = {
+                "user": user_id,
+                "room": self.rnd.choice(rooms),
+                "start_date": start.isoformat(),
+                "end_date": (
+                    start + timedelta(days=self.rnd.randint(1, 4))
+                ).isoformat(),
+            }
+            return client.post("/api/bookings/", data, **headers)
+
+        def cleanup():
+            # Удаляем по одной через сигналы, чтобы освободить и карту занятости
+            Booking.objects.filter(room__in=rooms, start_date__gte=first).delete()
+
+        return Scenario(call, accept=(201, 400), cleanup=cleanup)
+
+    def staff_listing(self, options):
+        # Курсоры первых страниц собираем заранее, замеряем только чтение
+        client, urls, url = Client(), [], "/api/bookings/?page_size=50"
+        while url and len(urls) < 20:
+            urls.append(url)
+            url = client.get(url, **self.staff).json().get("next")
+
+        def call(client):
+            return client.get(self.rnd.choice(urls), **self.staff)
+
+        return Scenario(call)
+
+    def run(self, scenario, options):
+        local = threading.local()
+        statuses = {}
+        lock = threading.Lock()
+
+        def call(_):
+            if not hasattr(local, "client"):
+                local.client = Client()
+            started = time.perf_counter()
+            response = scenario.call(local.client)
+            elapsed = time.perf_counter() - started
+            close_old_connections()
+            with lock:
+                statuses[response.status_code] = (
+                    statuses.get(response.status_code, 0) + 1
+                )
+            return elapsed
+
+        def close(_):
+            connections.close_all()
+
+        total = options["requests"]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            samples = list(pool.map(call, range(total)))
+            elapsed = time.perf_counter() - started
+            list(pool.map(close, range(options["concurrency"])))
+
+        stats = {key: round(value, 3) for key, value in summarize(samples).items()}
+        stats["rps"] = round(total / elapsed, 1)
+        stats["errors"] = sum(
+            count for code, count in statuses.items() if code not in scenario.accept
+        )
+        stats["statuses"] = {
+            str(code): count for code, count in sorted(statuses.items())
+        }
+        return stats
+
+    def report(self, name, stats):
+        self.stdout.write(
+            f"{name:20} {stats['rps']:8.1f} req/s  p50 {stats['p50_ms']:8.2f} ms  "
+            f"p95 {stats['p95_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms  "
+            f"errors {stats['errors']}  statuses {stats['statuses']}"
+        )
+
+    def compare(self, current, path, tolerance):
+        with open(path) as f:
+            baseline = json.load(f)
+        regressions = []
+        for name, stats in current["scenarios"].items():
+            base = baseline["scenarios"].get(name)
+            if base is None:
+                continue
+            p95 = stats["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0
+            rps = stats["rps"] / base["rps"] - 1 if base["rps"] else 0
+            self.stdout.write(f"{name:20} p95 {p95:+.1%}  throughput {rps:+.1%}")
+            if p95 > tolerance:
+                regressions.append(f"{name}: p95 {p95:+.1%}")
+            if rps < -tolerance:
+                regressions.append(f"{name}: throughput {rps:+.1%}")
+            if stats["errors"] > base["errors"]:
+                regressions.append(f"{name}: {stats['errors']} errors")
+        if regressions:
+            raise CommandError("Regressions: " + "; ".join(regressions))
+        self.stdout.write(f"No regressions against {path}")
+
+
+class Scenario:
+    def __init__(self, call, accept=(200,), cleanup=lambda: None):
+        self.call = call
+        self.accept = accept
+        self.cleanup = cleanup
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import setup_test_environment
+
+from rooms.benchmarks import summarize
+
+# Кэш каталога отключаем, иначе оба варианта меряют только его
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+class Command(BaseCommand):
+    help = "Compare availability search throughput of the WSGI and ASGI read paths"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument(
+            "--start", type=date.fromisoformat, default=date(2024, 7, 5)
+        )
+        parser.add_argument("--end", type=date.fromisoformat, default=date(2024, 7, 10))
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        params = {
+            "start_date": options["start"].isoformat(),
+            "end_date": options["end"].isoformat(),
+        }
+        total, concurrency = options["requests"], options["concurrency"]
+
+        with override_settings(CACHES=NO_CACHE):
+            wsgi = self.run_wsgi("/api/rooms/", params, total, concurrency)
+            asgi = asyncio.run(
+                self.run_asgi("/api/async/rooms/available/", params, total, concurrency)
+            )
+
+        for label, (elapsed, samples) in (("wsgi", wsgi), ("asgi", asgi)):
+            stats = summarize(samples)
+            self.stdout.write(
+                f"{label}: {total / elapsed:.1f} req/s, "
+                f"median {stats['median_ms']:.2f} ms, max {stats['max_ms']:.2f} ms"
+            )
+
+    def run_wsgi(self, url, params, total, concurrency):
+        local = threading.local()
+
+        def call(_):
+            if not hasattr(local, "client"):
+                local.client = Client()
+            started = time.perf_counter()
+            response = local.client.get(url, params)
+            assert response.status_code == 200, response.status_code
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(call, range(total)))
+        return time.perf_counter() - started, samples
+
+    async def run_asgi(self, url, params, total, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url, params)
+                assert response.status_code == 200, response.status_code
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(call() for _ in range(total)))
+        return time.perf_counter() - started, samples
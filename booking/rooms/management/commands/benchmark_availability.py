@@ -0,0 +1,107 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from rooms import availability
+from rooms.benchmarks import measure, seed, summarize
+from rooms.models import Booking, Room
+
+
+class Command(BaseCommand):
+    help = "Compare the legacy booking subquery with the availability engines"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start", type=date.fromisoformat, default=date(2024, 7, 5)
+        )
+        parser.add_argument("--end", type=date.fromisoformat, default=date(2024, 7, 10))
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--rooms",
+            type=int,
+            default=0,
+            help="Seed this many rooms for the run (rolled back afterwards)",
+        )
+        parser.add_argument("--bookings", type=int, default=0)
+        parser.add_argument(
+            "--explain",
+            action="store_true",
+            help="Print EXPLAIN ANALYZE for the NOT IN variants and the anti-join",
+        )
+
+    def handle(self, *args, **options):
+        start, end = options["start"], options["end"]
+
+        def legacy():
+            booked = Booking.objects.filter(
+                start_date__lt=end, end_date__gt=start
+            ).values_list("room_id", flat=True)
+            return list(
+                Room.objects.exclude(id__in=booked).values_list("id", flat=True)
+            )
+
+        def range_index():
+            booked = availability.overlapping_bookings(start, end).values_list(
+                "room_id", flat=True
+            )
+            return list(
+                Room.objects.exclude(id__in=booked).values_list("id", flat=True)
+            )
+
+        def bitmap():
+            booked = availability.booked_room_ids(start, end)
+            return list(
+                Room.objects.exclude(id__in=booked).values_list("id", flat=True)
+            )
+
+        def anti_join():
+            return list(Room.objects.available(start, end).values_list("id", flat=True))
+
+        scenarios = (
+            ("subquery", legacy),
+            ("range index", range_index),
+            ("bitmap", bitmap),
+            ("anti-join", anti_join),
+        )
+
+        with transaction.atomic():
+            if options["rooms"]:
+                seed(options["rooms"], options["bookings"])
+
+            expected = sorted(legacy())
+            for label, fn in scenarios[1:]:
+                if sorted(fn()) != expected:
+                    self.stderr.write(f"{label} disagrees on the available rooms")
+
+            self.stdout.write(
+                f"rooms={Room.objects.count()} bookings={Booking.objects.count()}"
+            )
+            for label, fn in scenarios:
+                stats = summarize(measure(fn, repeat=options["repeat"]))
+                self.stdout.write(
+                    f"{label:12} median {stats['median_ms']:.2f} ms "
+                    f"(min {stats['min_ms']:.2f}, max {stats['max_ms']:.2f})"
+                )
+
+            if options["explain"]:
+                booked = availability.overlapping_bookings(start, end).values_list(
+                    "room_id", flat=True
+                )
+                ids = availability.booked_room_ids(start, end)
+                plans = (
+                    ("NOT IN (subquery)", Room.objects.exclude(id__in=booked)),
+                    ("NOT IN (id list)", Room.objects.exclude(id__in=ids)),
+                    ("NOT EXISTS", Room.objects.available(start, end)),
+                )
+                for label, queryset in plans:
+                    self.stdout.write(f"\n{label}:")
+                    self.explain(queryset.values_list("id", flat=True))
+            transaction.set_rollback(True)
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+            for (line,) in cursor.fetchall():
+                self.stdout.write(line)
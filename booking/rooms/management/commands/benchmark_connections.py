@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+
+from rooms.benchmarks import summarize
+
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+class Command(BaseCommand):
+    help = "Measure requests per second with and without persistent DB connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument("--url", default="/api/rooms/")
+        parser.add_argument("--max-age", type=int, default=60)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        db_settings = connections.settings[DEFAULT_DB_ALIAS]
+        configured = db_settings["CONN_MAX_AGE"]
+
+        try:
+            with override_settings(CACHES=NO_CACHE):
+                for label, max_age in (
+                    ("new connection per request", 0),
+                    (
+                        f"persistent (CONN_MAX_AGE={options['max_age']})",
+                        options["max_age"],
+                    ),
+                ):
+                    db_settings["CONN_MAX_AGE"] = max_age
+                    elapsed, samples = self.run(options)
+                    stats = summarize(samples)
+                    self.stdout.write(
+                        f"{label}: {options['requests'] / elapsed:.1f} req/s, "
+                        f"median {stats['median_ms']:.2f} ms"
+                    )
+        finally:
+            db_settings["CONN_MAX_AGE"] = configured
+
+    def run(self, options):
+        local = threading.local()
+
+        def call(_):
+            if not hasattr(local, "client"):
+                local.client = Client()
+            started = time.perf_counter()
+            response = local.client.get(options["url"])
+            # Тестовый клиент не закрывает соединения сам, делаем то же,
+            # что и обработчик request_finished в настоящем сервере
+            close_old_connections()
+            assert response.status_code == 200, response.status_code
+            return time.perf_counter() - started
+
+        def close(_):
+            connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            samples = list(pool.map(call, range(options["requests"])))
+            elapsed = time.perf_counter() - started
+            list(pool.map(close, range(options["concurrency"])))
+        return elapsed, samples
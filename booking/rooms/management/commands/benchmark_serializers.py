@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from rooms.benchmarks import measure, seed, summarize
+from rooms.models import Booking, Room
+from rooms.renderers import ORJSONRenderer
+from rooms.rows import RowSerializer
+from rooms.serializers import BookingSerializer, RoomSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare CPU time of ModelSerializer + JSONRenderer with values() + "
+        "RowSerializer + ORJSONRenderer on list responses"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        cases = (
+            ("rooms", Room.objects.all(), RoomSerializer),
+            ("bookings", Booking.objects.all(), BookingSerializer),
+        )
+
+        with transaction.atomic():
+            # Не хватает строк — досеиваем и откатываем в конце
+            missing = rows - min(Room.objects.count(), Booking.objects.count())
+            if missing > 0:
+                seed(missing, missing)
+
+            for label, queryset, serializer_class in cases:
+                page = queryset.order_by("id")[:rows]
+                row_serializer = RowSerializer.for_serializer(serializer_class)
+
+                def before():
+                    data = serializer_class(list(page), many=True).data
+                    return JSONRenderer().render(data)
+
+                def after():
+                    data = row_serializer.many(page.values(*row_serializer.sources))
+                    return ORJSONRenderer().render(data)
+
+                if before() != after():
+                    self.stderr.write(f"{label}: fast path output differs")
+
+                results = {}
+                for name, fn in (
+                    ("model serializer", before),
+                    ("row serializer", after),
+                ):
+                    stats = summarize(
+                        measure(fn, repeat=repeat, clock=time.process_time)
+                    )
+                    results[name] = stats["median_ms"]
+                    self.stdout.write(
+                        f"{label:8} {name:16} CPU {stats['median_ms']:8.2f} ms "
+                        f"per {rows} rows (min {stats['min_ms']:.2f})"
+                    )
+                self.stdout.write(
+                    f"{label:8} speedup x{results['model serializer'] / results['row serializer']:.1f}"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,52 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rooms import jobs
+from rooms.models import Job
+
+
+class Command(BaseCommand):
+    help = "Queue a background job for run_jobs, or retry a failed one"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "kind", nargs="?", choices=[kind for kind, _ in Job.KIND_CHOICES]
+        )
+        parser.add_argument("--room", type=int, help="recompute_costs: only this room")
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            help="recompute_costs: bookings starting from this date (default today)",
+        )
+        parser.add_argument(
+            "--before",
+            type=date.fromisoformat,
+            help="purge_bookings: bookings that ended before this date",
+        )
+        parser.add_argument("--retry", type=int, help="Requeue a failed job by id")
+
+    def handle(self, *args, **options):
+        if options["retry"]:
+            job = Job.objects.filter(pk=options["retry"], status=Job.FAILED).first()
+            if job is None:
+                raise CommandError(f"No failed job #{options['retry']}")
+            jobs.retry(job)
+            self.stdout.write(f"Requeued {job.kind} #{job.pk} at id {job.cursor}")
+            return
+
+        kind = options["kind"]
+        if kind is None:
+            raise CommandError("Job kind is required")
+        params = {}
+        if kind == Job.RECOMPUTE_COSTS:
+            params["since"] = options["since"] or date.today()
+            if options["room"]:
+                params["room"] = options["room"]
+        elif kind == Job.PURGE_BOOKINGS:
+            if not options["before"]:
+                raise CommandError("purge_bookings needs --before")
+            params["before"] = options["before"]
+
+        job = jobs.enqueue(kind, **params)
+        self.stdout.write(f"Queued {job.kind} #{job.pk}")
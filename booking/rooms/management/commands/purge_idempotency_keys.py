@@ -0,0 +1,29 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rooms.idempotency import purge
+
+
+class Command(BaseCommand):
+    help = "Delete Idempotency-Key records older than ROOMS_IDEMPOTENCY_TTL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause", type=float, default=0.1, help="Sleep between chunks"
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(seconds=settings.ROOMS_IDEMPOTENCY_TTL)
+        total = 0
+        while True:
+            deleted = purge(before, options["chunk_size"])
+            total += deleted
+            if deleted < options["chunk_size"]:
+                break
+            time.sleep(options["pause"])
+        self.stdout.write(f"Deleted {total} idempotency keys created before {before}")
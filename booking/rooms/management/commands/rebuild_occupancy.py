@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rooms import occupancy
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-room occupancy bitmaps from bookings or verify them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare the bitmaps with bookings, do not rewrite them",
+        )
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            mismatches = occupancy.verify()
+            if mismatches:
+                for room_id, year in mismatches:
+                    self.stderr.write(f"room {room_id}, {year}: bitmap differs")
+                raise CommandError(f"{len(mismatches)} occupancy rows are out of sync")
+            self.stdout.write("Occupancy bitmaps match bookings")
+            return
+
+        rows = occupancy.rebuild()
+        self.stdout.write(f"Rebuilt {rows} occupancy rows")
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from rooms import jobs
+
+
+class Command(BaseCommand):
+    help = "Process background jobs (cost recomputation, purges, occupancy rebuilds)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="Exit when the queue is empty"
+        )
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument(
+            "--pause", type=float, default=0.1, help="Minimum sleep between chunks"
+        )
+        parser.add_argument(
+            "--duty-cycle",
+            type=float,
+            default=0.5,
+            help="Share of time spent working, the rest is left to live traffic",
+        )
+        parser.add_argument(
+            "--poll", type=float, default=5, help="Seconds between idle queue polls"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = jobs.claim()
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll"])
+                continue
+
+            self.stdout.write(f"{job}: started at id {job.cursor}")
+            try:
+                jobs.run(
+                    job,
+                    chunk_size=options["chunk_size"],
+                    pause=options["pause"],
+                    duty_cycle=options["duty_cycle"],
+                    log=self.progress,
+                )
+            except Exception as exc:
+                self.stderr.write(f"{job}: failed: {exc!r}")
+                continue
+            self.stdout.write(f"{job}: {job.processed} rows done")
+
+    def progress(self, job):
+        self.stdout.write(
+            f"{job}: {job.processed}/{job.total} ({job.progress:.0%}), id {job.cursor}"
+        )
@@ -0,0 +1,37 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from rooms.benchmarks import generate
+
+
+class Command(BaseCommand):
+    help = "Generate rooms, users and non-overlapping bookings for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=10_000)
+        parser.add_argument("--users", type=int, default=1_000_000)
+        parser.add_argument("--bookings", type=int, default=5_000_000)
+        parser.add_argument(
+            "--start", type=date.fromisoformat, default=date(2020, 1, 1)
+        )
+        parser.add_argument(
+            "--prefix",
+            default="load",
+            help="Username prefix, must not clash with an earlier run",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        generate(
+            options["rooms"],
+            options["users"],
+            options["bookings"],
+            start=options["start"],
+            prefix=options["prefix"],
+        )
+        self.stdout.write(
+            f"Seeded {options['rooms']} rooms, {options['users']} users and "
+            f"{options['bookings']} bookings in {time.perf_counter() - started:.1f} s"
+        )
@@ -0,0 +1,97 @@
+import hmac
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Счётчики живут в памяти процесса: при нескольких воркерах Prometheus
+# опрашивает каждый отдельно и суммирует по label instance
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+COUNTERS = {
+    "rooms_requests_total": "Requests served",
+    "rooms_db_seconds_total": "Time spent in SQL queries",
+    "rooms_serialize_seconds_total": "Time spent rendering response bodies",
+    "rooms_response_bytes_total": "Response body bytes sent",
+}
+HISTOGRAMS = {
+    "rooms_request_duration_seconds": ("Request latency", DURATION_BUCKETS),
+    "rooms_db_queries": ("SQL queries per request", QUERY_BUCKETS),
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_histograms = {}
+
+
+def _observe(name, labels, value):
+    buckets = HISTOGRAMS[name][1]
+    key = (name, labels)
+    if key not in _histograms:
+        _histograms[key] = [[0] * len(buckets), 0, 0.0]
+    counts, _, _ = histogram = _histograms[key]
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            counts[i] += 1
+    histogram[1] += 1
+    histogram[2] += value
+
+
+def record(endpoint, method, status, stats):
+    labels = (("endpoint", endpoint), ("method", method))
+    with _lock:
+        _counters["rooms_requests_total", labels + (("status", str(status)),)] += 1
+        _counters["rooms_db_seconds_total", labels] += stats["db_seconds"]
+        _counters["rooms_serialize_seconds_total", labels] += stats["serialize_seconds"]
+        _counters["rooms_response_bytes_total", labels] += stats["response_bytes"]
+        _observe("rooms_request_duration_seconds", labels, stats["total_seconds"])
+        _observe("rooms_db_queries", labels, stats["queries"])
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def _number(value):
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render():
+    lines = []
+    with _lock:
+        for name, help_text in COUNTERS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (metric, labels), value in sorted(_counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        for name, (help_text, buckets) in HISTOGRAMS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (metric, labels), (counts, count, total) in sorted(_histograms.items()):
+                if metric != name:
+                    continue
+                for bound, value in zip(buckets, counts):
+                    lines.append(f"{name}_bucket{_labels(labels, le=bound)} {value}")
+                lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {count}')
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    # METRICS_TOKEN задан — скрейпер должен прислать его как Bearer-токен
+    token = settings.METRICS_TOKEN
+    if token:
+        header = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(header, f"Bearer {token}"):
+            return HttpResponseForbidden()
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4")
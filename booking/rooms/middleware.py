@@ -0,0 +1,111 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+
+class RequestMetricsMiddleware:
+    """Считает SQL-запросы, время в базе, рендеринга и размер ответа.
+
+    Результат кладётся в ``response.metrics``, уходит в счётчики для
+    /api/metrics/ и, при DEBUG, в заголовки ответа.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Как у MiddlewareMixin: под ASGI цепочка не уходит в отдельный поток
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = self.start(request)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            self.count_queries(stack, stats)
+            response = self.get_response(request)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = self.start(request)
+        started = time.perf_counter()
+        # ORM из async-кода работает через sync_to_async(thread_sensitive=True):
+        # соединения — того потока, обёртки ставим и снимаем в нём же
+        stack = ExitStack()
+        await sync_to_async(self.count_queries)(stack, stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, stats, started)
+
+    @staticmethod
+    def start(request):
+        request.metrics = {
+            "queries": 0,
+            "db_seconds": 0.0,
+            "serialize_seconds": 0.0,
+            "response_bytes": 0,
+        }
+        return request.metrics
+
+    @staticmethod
+    def count_queries(stack, stats):
+        def count_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats["queries"] += 1
+                stats["db_seconds"] += time.perf_counter() - started
+
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(count_query))
+
+    def finish(self, request, response, stats, started):
+        stats["total_seconds"] = time.perf_counter() - started
+        # Потоковые ответы отдаются уже после middleware, их тело не считаем
+        if not response.streaming:
+            stats["response_bytes"] = len(response.content)
+
+        match = request.resolver_match
+        endpoint = match.view_name if match else "unmatched"
+        if endpoint != "metrics":
+            metrics.record(endpoint, request.method, response.status_code, stats)
+
+        response.metrics = stats
+        if settings.DEBUG:
+            self.add_headers(response, stats)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF-ответ рендерится после этого хука: засекаем время до и после
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.metrics["serialize_seconds"] += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def add_headers(response, stats):
+        db_ms = stats["db_seconds"] * 1000
+        serialize_ms = stats["serialize_seconds"] * 1000
+        total_ms = stats["total_seconds"] * 1000
+        response["X-DB-Queries"] = str(stats["queries"])
+        response["X-DB-Time-Ms"] = f"{db_ms:.2f}"
+        response["X-Serialize-Time-Ms"] = f"{serialize_ms:.2f}"
+        response["X-Response-Bytes"] = str(stats["response_bytes"])
+        response["Server-Timing"] = (
+            f"db;dur={db_ms:.2f}, serialize;dur={serialize_ms:.2f}, "
+            f"total;dur={total_ms:.2f}"
+        )
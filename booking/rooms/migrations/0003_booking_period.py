@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:13
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rooms", "0002_remove_booking_canceled_remove_room_is_available"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="booking",
+            name="period",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=models.Func(
+                    models.F("start_date"), models.F("end_date"), function="daterange"
+                ),
+                output_field=django.contrib.postgres.fields.ranges.DateRangeField(),
+                verbose_name="Period",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=django.contrib.postgres.indexes.GistIndex(
+                fields=["period"], name="booking_period_gist"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:15
+
+import django.contrib.postgres.constraints
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rooms", "0003_booking_period"),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.AddConstraint(
+            model_name="booking",
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(
+                expressions=[("room", "="), ("period", "&&")],
+                name="exclude_overlapping_bookings",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rooms", "0004_booking_no_overlap"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["start_date", "id"], name="booking_start_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["user", "start_date", "id"], name="booking_user_start_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                fields=["price_per_day", "id"], name="room_price_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(fields=["capacity", "id"], name="room_capacity_id_idx"),
+        ),
+    ]
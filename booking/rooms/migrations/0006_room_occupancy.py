@@ -0,0 +1,64 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_occupancy(apps, schema_editor):
+    from rooms.occupancy import build_bitmaps, to_bytes
+
+    Booking = apps.get_model("rooms", "Booking")
+    RoomOccupancy = apps.get_model("rooms", "RoomOccupancy")
+    stays = Booking.objects.values_list("room_id", "start_date", "end_date")
+    RoomOccupancy.objects.bulk_create(
+        [
+            RoomOccupancy(room_id=room_id, year=year, days=to_bytes(bits))
+            for (room_id, year), bits in build_bitmaps(stays.iterator()).items()
+        ],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rooms", "0005_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RoomOccupancy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.PositiveSmallIntegerField(verbose_name="Year")),
+                (
+                    "days",
+                    models.BinaryField(max_length=46, verbose_name="Booked nights"),
+                ),
+                (
+                    "room",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="occupancy",
+                        to="rooms.room",
+                        verbose_name="Room",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="roomoccupancy",
+            constraint=models.UniqueConstraint(
+                fields=("room", "year"), name="unique_room_occupancy_year"
+            ),
+        ),
+        migrations.RunPython(build_occupancy, migrations.RunPython.noop),
+    ]
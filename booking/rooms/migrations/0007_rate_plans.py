@@ -0,0 +1,116 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rooms", "0006_room_occupancy"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StayDiscount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "room_type",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("standard", "Standard"),
+                            ("deluxe", "Deluxe"),
+                            ("suite", "Suite"),
+                        ],
+                        max_length=10,
+                        verbose_name="Room Type",
+                    ),
+                ),
+                (
+                    "min_nights",
+                    models.PositiveSmallIntegerField(verbose_name="Minimum nights"),
+                ),
+                (
+                    "percent",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=5, verbose_name="Discount, %"
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="RatePlan",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, verbose_name="Name")),
+                (
+                    "room_type",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("standard", "Standard"),
+                            ("deluxe", "Deluxe"),
+                            ("suite", "Suite"),
+                        ],
+                        max_length=10,
+                        verbose_name="Room Type",
+                    ),
+                ),
+                ("start_date", models.DateField(verbose_name="Start date")),
+                ("end_date", models.DateField(verbose_name="End date")),
+                (
+                    "price_per_day",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=10,
+                        null=True,
+                        verbose_name="Price per day",
+                    ),
+                ),
+                (
+                    "weekend_surcharge",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=5,
+                        null=True,
+                        verbose_name="Weekend surcharge, %",
+                    ),
+                ),
+                (
+                    "priority",
+                    models.SmallIntegerField(default=0, verbose_name="Priority"),
+                ),
+                (
+                    "room",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rate_plans",
+                        to="rooms.room",
+                        verbose_name="Room",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rooms", "0007_rate_plans"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(fields=["room_type", "id"], name="room_type_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(fields=["name"], name="room_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="roomoccupancy",
+            index=models.Index(fields=["year", "room"], name="occupancy_year_room_idx"),
+        ),
+    ]
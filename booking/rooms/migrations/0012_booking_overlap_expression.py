@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:43
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rooms", "0011_idempotency_keys"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="booking",
+            name="exclude_overlapping_bookings",
+        ),
+        migrations.AddConstraint(
+            model_name="booking",
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(
+                expressions=[
+                    ("room", "="),
+                    (
+                        models.Func(
+                            models.F("start_date"),
+                            models.F("end_date"),
+                            function="daterange",
+                            output_field=django.contrib.postgres.fields.ranges.DateRangeField(),
+                        ),
+                        "&&",
+                    ),
+                ],
+                name="exclude_overlapping_bookings",
+                violation_error_message="Room is already booked for the specified dates",
+            ),
+        ),
+    ]
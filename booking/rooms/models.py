@@ -1,5 +1,13 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateRangeField, RangeOperators
+from django.contrib.postgres.indexes import GistIndex
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import Exists, F, Func, OuterRef
+from django.utils import timezone
+
+ROOM_ALREADY_BOOKED = "Room is already booked for the specified dates"
 
 
 class MyUser(AbstractUser):
@@ -9,6 +17,25 @@ class MyUser(AbstractUser):
         return self.username
 
 
+class RoomQuerySet(models.QuerySet):
+    def available(self, start_date, end_date):
+        # Анти-join (NOT EXISTS) по карте занятости: на комнату — одна строка
+        # за год по индексу, без списка занятых id в самом запросе
+        from .occupancy import booked_in, year_spans
+
+        # Ни одной ночи в окне: занятой быть нечему, а пустое условие в
+        # подзапросе скрыло бы все комнаты с любой строкой карты
+        if not year_spans(start_date, end_date):
+            return self
+        return self.filter(
+            ~Exists(
+                RoomOccupancy.objects.filter(
+                    booked_in(start_date, end_date), room=OuterRef("pk")
+                )
+            )
+        )
+
+
 class Room(models.Model):
     STANDARD = "standard"
     DELUXE = "deluxe"
@@ -32,6 +59,17 @@ class Room(models.Model):
         verbose_name="Room Type",
     )
 
+    objects = RoomQuerySet.as_manager()
+
+    class Meta:
+        # Фильтры RoomFilter + курсорная пагинация (id в конце индекса)
+        indexes = [
+            models.Index(fields=["price_per_day", "id"], name="room_price_id_idx"),
+            models.Index(fields=["capacity", "id"], name="room_capacity_id_idx"),
+            models.Index(fields=["room_type", "id"], name="room_type_id_idx"),
+            models.Index(fields=["name"], name="room_name_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.room_type}"
 
@@ -48,15 +86,271 @@ class Booking(models.Model):
         null=True,
         verbose_name="Total price",
     )
+    # Полуоткрытый интервал [start_date, end_date) — поддерживается самой БД
+    # и индексируется GiST, поэтому поиск пересечений не сканирует всю историю.
+    period = models.GeneratedField(
+        expression=Func(F("start_date"), F("end_date"), function="daterange"),
+        output_field=DateRangeField(),
+        db_persist=True,
+        verbose_name="Period",
+    )
+
+    class Meta:
+        indexes = [
+            GistIndex(fields=["period"], name="booking_period_gist"),
+            models.Index(fields=["start_date", "id"], name="booking_start_id_idx"),
+            models.Index(
+                fields=["user", "start_date", "id"], name="booking_user_start_id_idx"
+            ),
+        ]
+        constraints = [
+            # Двойное бронирование запрещено на уровне БД, без гонок между
+            # запросами. Интервал — выражением, а не полем period: значение
+            # генерируемого поля есть только после сохранения, и full_clean()
+            # (формы админки) не смог бы проверить ограничение заранее
+            ExclusionConstraint(
+                name="exclude_overlapping_bookings",
+                expressions=[
+                    ("room", RangeOperators.EQUAL),
+                    (
+                        Func(
+                            F("start_date"),
+                            F("end_date"),
+                            function="daterange",
+                            output_field=DateRangeField(),
+                        ),
+                        RangeOperators.OVERLAPS,
+                    ),
+                ],
+                violation_error_message=ROOM_ALREADY_BOOKED,
+            ),
+        ]
 
     def __str__(self):
         return f"{self.room.name} - {self.user.username} ({self.start_date} to {self.end_date})"
 
+    def validate_constraints(self, exclude=None):
+        # Django 5.0 читает все поля модели, а period у несохранённой брони
+        # недоступен; ограничения на нём не держатся, его можно пропустить
+        super().validate_constraints(exclude={*(exclude or ()), "period"})
+
     def calculate_cost(self):
-        duration = (self.end_date - self.start_date).days
-        self.cost = duration * self.room.price_per_day
+        from .pricing import quote
+
+        self.cost = quote(self.room, self.start_date, self.end_date)
 
     def save(self, *args, **kwargs):
         if not self.cost:
             self.calculate_cost()
-        super().save(*args, **kwargs)
+        # Карта занятости обновляется в post_save в той же транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class BookingArchive(models.Model):
+    # Завершённые брони, перенесённые archive_bookings из Booking с тем же id.
+    # Горячая таблица (и индекс ограничения на пересечения) растёт только на
+    # текущие и будущие брони, история остаётся доступной через API.
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        MyUser,
+        on_delete=models.CASCADE,
+        related_name="archived_bookings",
+        verbose_name="User",
+    )
+    room = models.ForeignKey(
+        Room,
+        on_delete=models.CASCADE,
+        related_name="archived_bookings",
+        verbose_name="Room",
+    )
+    start_date = models.DateField(verbose_name="Start date")
+    end_date = models.DateField(verbose_name="End date")
+    cost = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        verbose_name="Total price",
+    )
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Archived")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["start_date", "id"], name="archive_start_id_idx"),
+            models.Index(
+                fields=["user", "start_date", "id"], name="archive_user_start_id_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.room_id} - {self.user_id} ({self.start_date} to {self.end_date})"
+
+
+class RatePlan(models.Model):
+    # Сезонный тариф: для комнаты, для типа комнат или для всех сразу.
+    # Пустые цена/надбавка не переопределяют значения менее точных тарифов.
+    name = models.CharField(max_length=100, verbose_name="Name")
+    room = models.ForeignKey(
+        Room,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="rate_plans",
+        verbose_name="Room",
+    )
+    room_type = models.CharField(
+        max_length=10,
+        choices=Room.ROOM_TYPE_CHOICES,
+        blank=True,
+        verbose_name="Room Type",
+    )
+    start_date = models.DateField(verbose_name="Start date")
+    end_date = models.DateField(verbose_name="End date")
+    price_per_day = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Price per day",
+    )
+    weekend_surcharge = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Weekend surcharge, %",
+    )
+    priority = models.SmallIntegerField(default=0, verbose_name="Priority")
+
+    def __str__(self):
+        return f"{self.name} ({self.start_date} to {self.end_date})"
+
+
+class StayDiscount(models.Model):
+    room_type = models.CharField(
+        max_length=10,
+        choices=Room.ROOM_TYPE_CHOICES,
+        blank=True,
+        verbose_name="Room Type",
+    )
+    min_nights = models.PositiveSmallIntegerField(verbose_name="Minimum nights")
+    percent = models.DecimalField(
+        max_digits=5, decimal_places=2, verbose_name="Discount, %"
+    )
+
+    def __str__(self):
+        return f"{self.percent}% from {self.min_nights} nights"
+
+
+class RoomOccupancy(models.Model):
+    # Занятые ночи комнаты за год: бит i — ночь 1 января + i
+    BYTES = 46
+
+    room = models.ForeignKey(
+        Room,
+        on_delete=models.CASCADE,
+        related_name="occupancy",
+        verbose_name="Room",
+    )
+    year = models.PositiveSmallIntegerField(verbose_name="Year")
+    days = models.BinaryField(max_length=BYTES, verbose_name="Booked nights")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["room", "year"], name="unique_room_occupancy_year"
+            ),
+        ]
+        # Поиск по датам читает карты всех комнат за нужные годы
+        indexes = [
+            models.Index(fields=["year", "room"], name="occupancy_year_room_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.room_id} - {self.year}"
+
+
+class Job(models.Model):
+    # Фоновая задача для run_jobs: обрабатывает строки пачками по id,
+    # cursor — последний обработанный id, с него задача и продолжается
+    RECOMPUTE_COSTS = "recompute_costs"
+    PURGE_BOOKINGS = "purge_bookings"
+    REBUILD_OCCUPANCY = "rebuild_occupancy"
+    KIND_CHOICES = [
+        (RECOMPUTE_COSTS, "Recompute booking costs"),
+        (PURGE_BOOKINGS, "Purge expired bookings"),
+        (REBUILD_OCCUPANCY, "Rebuild occupancy bitmaps"),
+    ]
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES, verbose_name="Kind")
+    params = models.JSONField(default=dict, blank=True, verbose_name="Parameters")
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED, verbose_name="Status"
+    )
+    cursor = models.BigIntegerField(default=0, verbose_name="Last processed id")
+    processed = models.PositiveIntegerField(default=0, verbose_name="Processed")
+    total = models.PositiveIntegerField(null=True, blank=True, verbose_name="Total")
+    error = models.TextField(blank=True, verbose_name="Error")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Started")
+    heartbeat_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Last heartbeat"
+    )
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Finished")
+
+    class Meta:
+        # Воркер выбирает самую старую задачу в очереди
+        indexes = [models.Index(fields=["status", "id"], name="job_status_id_idx")]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 1.0 if self.status == self.DONE else 0.0
+        return min(self.processed / self.total, 1.0)
+
+
+class IdempotencyKey(models.Model):
+    # Ответ на POST с заголовком Idempotency-Key: повтор с тем же ключом
+    # получает сохранённый ответ. status_code пуст, пока запрос выполняется.
+    user = models.ForeignKey(
+        MyUser,
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys",
+        verbose_name="User",
+    )
+    key = models.CharField(max_length=255, verbose_name="Key")
+    fingerprint = models.CharField(max_length=64, verbose_name="Request fingerprint")
+    status_code = models.PositiveSmallIntegerField(
+        null=True, blank=True, verbose_name="Response status"
+    )
+    response = models.JSONField(
+        null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Response"
+    )
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Created")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_user_key"),
+        ]
+        # Очистка по TTL удаляет самые старые ключи
+        indexes = [
+            models.Index(fields=["created_at"], name="idempotency_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key}"
@@ -0,0 +1,227 @@
+from collections import defaultdict
+from datetime import MAXYEAR, date
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, F, Func, Q, Value
+
+from .models import Booking, Room, RoomOccupancy
+
+EMPTY = bytes(RoomOccupancy.BYTES)
+
+
+def to_int(days):
+    return int.from_bytes(days, "little")
+
+
+def to_bytes(bits):
+    return bits.to_bytes(RoomOccupancy.BYTES, "little")
+
+
+def year_spans(start_date, end_date):
+    # Разбивает [start_date, end_date) по годам: (год, первая ночь, граница)
+    spans = []
+    cursor = start_date
+    while cursor < end_date:
+        new_year = date(cursor.year, 1, 1)
+        # У 9999 года нет следующего: end_date и так не дальше date.max
+        stop = end_date
+        if cursor.year < MAXYEAR:
+            stop = min(end_date, date(cursor.year + 1, 1, 1))
+        spans.append((cursor.year, (cursor - new_year).days, (stop - new_year).days))
+        cursor = stop
+    return spans
+
+
+def mask(lo, hi):
+    return ((1 << (hi - lo)) - 1) << lo
+
+
+class NightsOverlap(Func):
+    # Есть ли в карте days занятые ночи [lo, hi): нужные байты карты
+    # переводятся в bit(n) через hex и сравниваются с маской побитовым AND.
+    # Порядок бит при таком переводе одинаков у карты и у маски. Проверка
+    # через position(...) > 0, а не <> 0: для <> планировщик считает, что
+    # заняты почти все комнаты, и не выбирает проход по индексу с LIMIT.
+    output_field = BooleanField()
+
+    def __init__(self, lo, hi):
+        first, last = lo // 8, (hi - 1) // 8 + 1
+        self.first, self.width = first, (last - first) * 8
+        bits = to_bytes(mask(lo, hi))[first:last]
+        super().__init__(F("days"), Value("x" + bits.hex()))
+
+    def as_sql(self, compiler, connection):
+        days, days_params = compiler.compile(self.source_expressions[0])
+        bits, bits_params = compiler.compile(self.source_expressions[1])
+        part = f"substring({days} from {self.first + 1} for {self.width // 8})"
+        sql = (
+            f"position(B'1' in (('x' || encode({part}, 'hex'))::bit({self.width}) "
+            f"& ({bits})::bit({self.width}))) > 0"
+        )
+        return sql, (*days_params, *bits_params)
+
+
+def booked_in(start_date, end_date):
+    # Условие на RoomOccupancy: в [start_date, end_date) есть занятые ночи
+    condition = Q()
+    for year, lo, hi in year_spans(start_date, end_date):
+        condition |= Q(NightsOverlap(lo, hi), year=year)
+    return condition
+
+
+def build_bitmaps(stays):
+    bitmaps = defaultdict(int)
+    for room_id, start_date, end_date in stays:
+        for year, lo, hi in year_spans(start_date, end_date):
+            bitmaps[room_id, year] |= mask(lo, hi)
+    return bitmaps
+
+
+def _apply(occupied=(), released=()):
+    occupied = build_bitmaps(occupied)
+    released = build_bitmaps(released)
+    keys = set(occupied) | set(released)
+    if not keys:
+        return
+
+    # Строки создаём только под новые ночи: освобождать в пустой строке нечего,
+    # а при каскадном удалении комнаты новая строка сломала бы удаление
+    RoomOccupancy.objects.bulk_create(
+        [RoomOccupancy(room_id=r, year=y, days=EMPTY) for r, y in occupied],
+        ignore_conflicts=True,
+    )
+    lookup = Q()
+    for room_id, year in keys:
+        lookup |= Q(room_id=room_id, year=year)
+    rows = list(
+        RoomOccupancy.objects.select_for_update()
+        .filter(lookup)
+        .order_by("room_id", "year")
+    )
+    for row in rows:
+        key = (row.room_id, row.year)
+        bits = (to_int(row.days) & ~released.get(key, 0)) | occupied.get(key, 0)
+        row.days = to_bytes(bits)
+    RoomOccupancy.objects.bulk_update(rows, ["days"])
+
+
+def occupy(stays):
+    with transaction.atomic():
+        _apply(occupied=stays)
+
+
+def release(stays):
+    with transaction.atomic():
+        _apply(released=stays)
+
+
+def move(before, after):
+    with transaction.atomic():
+        _apply(occupied=[after], released=[before] if before else [])
+
+
+def _window_query(start_date, end_date, room_ids):
+    spans = year_spans(start_date, end_date)
+    rows = RoomOccupancy.objects.filter(year__in=[year for year, _, _ in spans])
+    if room_ids is not None:
+        rows = rows.filter(room_id__in=room_ids)
+
+    offsets = {}
+    offset = 0
+    for year, lo, hi in spans:
+        offsets[year] = (lo, hi, offset)
+        offset += hi - lo
+    # values(), а не values_list(): в Django 5.0 только он лениво работает с aiterator()
+    return rows.values("room_id", "year", "days"), offsets
+
+
+def _add_window_bits(bitsets, offsets, row):
+    lo, hi, offset = offsets[row["year"]]
+    bits = (to_int(row["days"]) >> lo) & ((1 << (hi - lo)) - 1)
+    if bits:
+        bitsets[row["room_id"]] |= bits << offset
+
+
+def window_bitsets(start_date, end_date, room_ids=None):
+    # Бит i — занята ночь start_date + i; комнаты без броней в результат не попадают
+    rows, offsets = _window_query(start_date, end_date, room_ids)
+    bitsets = defaultdict(int)
+    for row in rows:
+        _add_window_bits(bitsets, offsets, row)
+    return bitsets
+
+
+async def awindow_bitsets(start_date, end_date, room_ids=None):
+    rows, offsets = _window_query(start_date, end_date, room_ids)
+    bitsets = defaultdict(int)
+    async for row in rows.aiterator():
+        _add_window_bits(bitsets, offsets, row)
+    return bitsets
+
+
+def expected_bitmaps():
+    stays = Booking.objects.values_list("room_id", "start_date", "end_date")
+    return build_bitmaps(stays.iterator(chunk_size=5000))
+
+
+def rebuild():
+    with transaction.atomic():
+        # Пока идёт пересборка, новые брони ждут, иначе их ночи потеряются
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {Booking._meta.db_table} IN SHARE MODE")
+            # Пересборка всей таблицы дольше обычного лимита на запрос
+            cursor.execute("SET LOCAL statement_timeout = 0")
+        bitmaps = expected_bitmaps()
+        RoomOccupancy.objects.all().delete()
+        RoomOccupancy.objects.bulk_create(
+            [
+                RoomOccupancy(room_id=room_id, year=year, days=to_bytes(bits))
+                for (room_id, year), bits in bitmaps.items()
+            ],
+            batch_size=5000,
+        )
+    return len(bitmaps)
+
+
+def rebuild_rooms(room_ids):
+    # Пересборка части комнат без блокировки всей таблицы броней (для run_jobs).
+    # FOR UPDATE на комнатах ждёт и задерживает вставки броней в них (FK берёт
+    # KEY SHARE), а на картах — удаления, которые карты освобождают.
+    with transaction.atomic():
+        room_ids = list(
+            Room.objects.select_for_update()
+            .filter(id__in=room_ids)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        list(
+            RoomOccupancy.objects.select_for_update()
+            .filter(room_id__in=room_ids)
+            .order_by("room_id", "year")
+            .values_list("id", flat=True)
+        )
+        stays = Booking.objects.filter(room_id__in=room_ids).values_list(
+            "room_id", "start_date", "end_date"
+        )
+        bitmaps = build_bitmaps(stays)
+        RoomOccupancy.objects.filter(room_id__in=room_ids).delete()
+        RoomOccupancy.objects.bulk_create(
+            [
+                RoomOccupancy(room_id=room_id, year=year, days=to_bytes(bits))
+                for (room_id, year), bits in bitmaps.items()
+            ]
+        )
+    return len(bitmaps)
+
+
+def verify():
+    # Возвращает (комната, год) с расхождениями между картой и бронями
+    expected = expected_bitmaps()
+    stored = {
+        (room_id, year): to_int(days)
+        for room_id, year, days in RoomOccupancy.objects.values_list(
+            "room_id", "year", "days"
+        ).iterator(chunk_size=5000)
+    }
+    keys = set(expected) | set(stored)
+    return sorted(k for k in keys if expected.get(k, 0) != stored.get(k, 0))
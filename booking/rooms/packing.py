@@ -0,0 +1,70 @@
+from decimal import Decimal
+
+# Подбор комнат для группы: bounded knapsack по вместимости. Комнаты одной
+# вместимости взаимозаменяемы, из них всегда выгоднее брать самые дешёвые,
+# поэтому решение — это только «сколько комнат каждой вместимости». Состояние
+# ДП — сколько гостей уже размещено (с потолком guests), в каждом держим
+# limit лучших вариантов: так получаем не один ответ, а несколько лучших.
+
+CHEAPEST = "cost"
+FEWEST = "rooms"
+OBJECTIVES = (CHEAPEST, FEWEST)
+
+_KEYS = {
+    CHEAPEST: lambda cost, count: (cost, count),
+    FEWEST: lambda cost, count: (count, cost),
+}
+
+
+def pack(rooms, guests, limit=5, objective=CHEAPEST, max_rooms=None):
+    # rooms — объекты с capacity и total_cost; возвращает до limit
+    # комбинаций (списков комнат), лучшие первыми
+    key = _KEYS[objective]
+    groups = {}
+    for room in rooms:
+        if room.capacity > 0:
+            # Комната больше группы размещает её целиком, как и любая такая же
+            groups.setdefault(min(room.capacity, guests), []).append(room)
+    # По убыванию вместимости: добавляемая группа — самая маленькая в
+    # комбинации, и лишнюю комнату можно отсечь прямо при переходе
+    capacities = sorted(groups, reverse=True)
+    for capacity in capacities:
+        groups[capacity].sort(key=lambda room: (room.total_cost, room.id))
+
+    # best[g] — варианты (cost, count, counts), размещающие g гостей
+    best = [[] for _ in range(guests + 1)]
+    best[0].append((Decimal(0), 0, ()))
+    for capacity in capacities:
+        group = groups[capacity]
+        prefix = [Decimal(0)]
+        for room in group[: -(-guests // capacity)]:
+            prefix.append(prefix[-1] + room.total_cost)
+
+        step = [[] for _ in range(guests + 1)]
+        for placed, variants in enumerate(best):
+            for cost, count, counts in variants:
+                step[placed].append((cost, count, counts + (0,)))
+                if placed == guests:
+                    continue
+                for taken in range(1, len(prefix)):
+                    # Без последней комнаты группа уже размещена — она лишняя
+                    if placed + (taken - 1) * capacity >= guests:
+                        break
+                    if max_rooms is not None and count + taken > max_rooms:
+                        break
+                    step[min(placed + taken * capacity, guests)].append(
+                        (cost + prefix[taken], count + taken, counts + (taken,))
+                    )
+        for variants in step:
+            variants.sort(key=lambda variant: key(variant[0], variant[1]))
+            del variants[limit:]
+        best = step
+
+    return [
+        [
+            room
+            for capacity, taken in zip(capacities, counts)
+            for room in groups[capacity][:taken]
+        ]
+        for _, _, counts in best[guests]
+    ]
@@ -0,0 +1,162 @@
+import json
+from base64 import b64decode, b64encode
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import BooleanField, F, Func, Q, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+from rest_framework.utils.urls import replace_query_param
+
+# Keyset-курсор: значения всех полей сортировки у граничной строки. Следующая
+# страница — строки строго после неё, (price, id) > (v, last_id), без offset:
+# сколько бы ни было равных цен, глубокая страница не дороже первой.
+# Поля сортировки не должны быть NULL — сравнение с NULL строки теряет.
+
+Cursor = namedtuple("Cursor", ["reverse", "position"])
+
+
+class RowCompare(Func):
+    # (a, b) > (x, y) — сравнение строк; Postgres ведёт его по индексу (a, b)
+    output_field = BooleanField()
+
+    def __init__(self, fields, values, operator):
+        self.operator = operator
+        super().__init__(*(F(name) for name in fields), *values)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        parts, params = [], []
+        for expression in self.source_expressions:
+            sql, part_params = compiler.compile(expression)
+            parts.append(sql)
+            params.extend(part_params)
+        half = len(parts) // 2
+        left, right = ", ".join(parts[:half]), ", ".join(parts[half:])
+        return f"({left}) {self.operator} ({right})", params
+
+
+def _after(ordering, values):
+    # Условие «строка идёт после values» в порядке ordering
+    names = [order.lstrip("-") for order in ordering]
+    descending = {order.startswith("-") for order in ordering}
+    if len(descending) == 1:
+        return RowCompare(names, values, "<" if descending.pop() else ">")
+    # Разные направления: (a > x) OR (a = x AND b < y) OR ...
+    condition, equal = Q(), Q()
+    for order, name, value in zip(ordering, names, values):
+        lookup = "lt" if order.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+class StableCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        # id в конце делает порядок однозначным при равных ценах/датах; его
+        # направление — как у первого поля, чтобы сравнение шло одной строкой
+        if not {"id", "-id", "pk", "-pk"} & set(ordering):
+            ordering += ("-id" if ordering[0].startswith("-") else "id",)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = [
+            queryset.model._meta.get_field(order.lstrip("-")) for order in self.ordering
+        ]
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(
+                _after(ordering, self._position_values(self.cursor.position))
+            )
+
+        # Лишняя строка показывает, есть ли страница дальше
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        has_more = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+
+        if self.page:
+            self.previous_position = self._get_position(self.page[0])
+            self.next_position = self._get_position(self.page[-1])
+        elif self.cursor is not None:
+            self.previous_position = self.next_position = self.cursor.position
+        # Назад от курсора всегда есть строка, с которой он был выдан
+        self.has_next = True if reverse else has_more
+        self.has_previous = has_more if reverse else self.cursor is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(reverse=True, position=self.previous_position))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            reverse, position = json.loads(b64decode(encoded.encode("ascii")))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(reverse=bool(reverse), position=position)
+
+    def encode_cursor(self, cursor):
+        data = json.dumps([int(cursor.reverse), cursor.position])
+        encoded = b64encode(data.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position(self, row):
+        # Строки списка — словари values() или объекты модели
+        if isinstance(row, dict):
+            values = [row[order.lstrip("-")] for order in self.ordering]
+        else:
+            values = [getattr(row, field.attname) for field in self.fields]
+        return [str(value) for value in values]
+
+    def _position_values(self, position):
+        values = []
+        for field, value in zip(self.fields, position):
+            field = field.target_field if field.is_relation else field
+            try:
+                values.append(Value(field.to_python(value), output_field=field))
+            except (TypeError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return values
+
+
+class BookingCursorPagination(StableCursorPagination):
+    ordering = ("start_date", "id")
+
+
+class RoomCursorPagination(StableCursorPagination):
+    ordering = ("id",)
+
+
+class UserCursorPagination(StableCursorPagination):
+    ordering = ("id",)
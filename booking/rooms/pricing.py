@@ -0,0 +1,221 @@
+from collections import OrderedDict
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Q
+
+from . import cache
+from .models import RatePlan, StayDiscount
+from .occupancy import year_spans
+
+CENT = Decimal("0.01")
+HUNDRED = Decimal(100)
+# Ночи с пятницы на субботу и с субботы на воскресенье
+WEEKEND = (4, 5)
+MAX_CALENDARS = 4096
+
+# Скомпилированные календари: ключ _calendar_key -> (версия, префиксные суммы)
+_calendars = OrderedDict()
+_discounts = {}
+_own_plans = {}
+
+
+def _decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _precedence(plan):
+    # Чем точнее тариф, тем позже он применяется и тем важнее
+    specificity = 2 if plan.room_id else 1 if plan.room_type else 0
+    return specificity, plan.priority, plan.start_date
+
+
+def _applies_to(plan, room):
+    if plan.room_id:
+        return plan.room_id == room.id
+    return plan.room_type in ("", room.room_type)
+
+
+def compile_calendar(room, year, plans):
+    first = date(year, 1, 1)
+    days = (date(year, 12, 31) - first).days + 1
+    base = _decimal(room.price_per_day)
+    rates = [base] * days
+    surcharges = [None] * days
+
+    for plan in sorted((p for p in plans if _applies_to(p, room)), key=_precedence):
+        lo = max((plan.start_date - first).days, 0)
+        hi = min((plan.end_date - first).days, days)
+        if lo >= hi:
+            continue
+        if plan.price_per_day is not None:
+            rates[lo:hi] = [plan.price_per_day] * (hi - lo)
+        if plan.weekend_surcharge is not None:
+            surcharges[lo:hi] = [plan.weekend_surcharge] * (hi - lo)
+
+    # Префиксные суммы: стоимость любого интервала — одна разность
+    prefix = [Decimal(0)] * (days + 1)
+    weekday = first.weekday()
+    for i in range(days):
+        rate = rates[i]
+        if surcharges[i] and (weekday + i) % 7 in WEEKEND:
+            rate += rate * surcharges[i] / HUNDRED
+        prefix[i + 1] = prefix[i] + rate
+    return prefix
+
+
+def _calendar_key(room, year, own_plans):
+    # Календарь зависит от года, типа и базовой цены, а у комнаты со своими
+    # тарифами — ещё и от неё самой. Остальные комнаты делят календари:
+    # на 10 тысяч комнат их десятки, а не по одному на комнату и год
+    room_id = room.id if room.id in own_plans else None
+    return year, room.room_type, _decimal(room.price_per_day), room_id
+
+
+def _load_calendars(rooms_by_key, version):
+    years = sorted({key[0] for key in rooms_by_key})
+    rooms = {room.id: room for room in rooms_by_key.values()}
+    plans = list(
+        RatePlan.objects.filter(
+            Q(room_id__in=rooms)
+            | Q(
+                room__isnull=True,
+                room_type__in={"", *(room.room_type for room in rooms.values())},
+            ),
+            start_date__lte=date(years[-1], 12, 31),
+            end_date__gt=date(years[0], 1, 1),
+        )
+    )
+    compiled = {}
+    for key, room in rooms_by_key.items():
+        compiled[key] = compile_calendar(room, key[0], plans)
+        _calendars[key] = (version, compiled[key])
+        _calendars.move_to_end(key)
+    # Календари текущей пачки не вытесняем, даже если их больше лимита
+    while len(_calendars) > max(MAX_CALENDARS, len(compiled)):
+        _calendars.popitem(last=False)
+    return compiled
+
+
+def _stay_discounts(version):
+    if _discounts.get("version") != version:
+        _discounts["version"] = version
+        _discounts["rules"] = list(
+            StayDiscount.objects.values_list("room_type", "min_nights", "percent")
+        )
+    return _discounts["rules"]
+
+
+def _rooms_with_plans(version):
+    if _own_plans.get("version") != version:
+        _own_plans["version"] = version
+        _own_plans["rooms"] = set(
+            RatePlan.objects.filter(room__isnull=False).values_list(
+                "room_id", flat=True
+            )
+        )
+    return _own_plans["rooms"]
+
+
+def _get_calendars(keys, version):
+    # keys — {(room_id, год): Room}; результат — по тем же ключам
+    own_plans = _rooms_with_plans(version)
+    calendars = {}
+    missing = {}
+    pending = []
+    for target, room in keys.items():
+        key = _calendar_key(room, target[1], own_plans)
+        cached = _calendars.get(key)
+        if cached is not None and cached[0] == version:
+            _calendars.move_to_end(key)
+            calendars[target] = cached[1]
+        else:
+            missing.setdefault(key, room)
+            pending.append((target, key))
+    if missing:
+        compiled = _load_calendars(missing, version)
+        for target, key in pending:
+            calendars[target] = compiled[key]
+    return calendars
+
+
+def _discount_percent(room, nights, discounts):
+    return max(
+        (
+            pct
+            for room_type, min_nights, pct in discounts
+            if nights >= min_nights and room_type in ("", room.room_type)
+        ),
+        default=0,
+    )
+
+
+def _discounted(total, percent):
+    if percent:
+        total -= total * percent / HUNDRED
+    return total.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def quote_many(stays):
+    # stays — (Room, start_date, end_date); тарифы грузятся одним запросом
+    # на всю пачку, сама цена — пара разностей префиксных сумм на ночь года
+    version = cache.current_version(cache.PRICING_VERSION)
+    calendars = _get_calendars(
+        {
+            (room.id, year): room
+            for room, start_date, end_date in stays
+            for year, _, _ in year_spans(start_date, end_date)
+        },
+        version,
+    )
+
+    discounts = _stay_discounts(version) if stays else []
+    costs = []
+    for room, start_date, end_date in stays:
+        total = Decimal(0)
+        for year, lo, hi in year_spans(start_date, end_date):
+            prefix = calendars[room.id, year]
+            total += prefix[hi] - prefix[lo]
+        nights = (end_date - start_date).days
+        costs.append(_discounted(total, _discount_percent(room, nights, discounts)))
+    return costs
+
+
+def quote_windows(windows, start_date, end_date, nights):
+    # windows — (Room, i): заезд start_date + i на nights ночей внутри
+    # [start_date, end_date). Префиксные суммы годов склеиваются в одну на
+    # комнату, дальше каждое окно — одна разность.
+    version = cache.current_version(cache.PRICING_VERSION)
+    spans = year_spans(start_date, end_date)
+    rooms = {room.id: room for room, _ in windows}
+    calendars = _get_calendars(
+        {
+            (room_id, year): room
+            for room_id, room in rooms.items()
+            for year, _, _ in spans
+        },
+        version,
+    )
+
+    discounts = _stay_discounts(version) if windows else []
+    prefixes = {}
+    percents = {}
+    for room_id, room in rooms.items():
+        percents[room_id] = _discount_percent(room, nights, discounts)
+        prefix = [Decimal(0)]
+        for year, lo, hi in spans:
+            calendar = calendars[room_id, year]
+            shift = prefix[-1] - calendar[lo]
+            prefix.extend(shift + calendar[i] for i in range(lo + 1, hi + 1))
+        prefixes[room_id] = prefix
+
+    return [
+        _discounted(
+            prefixes[room.id][i + nights] - prefixes[room.id][i], percents[room.id]
+        )
+        for room, i in windows
+    ]
+
+
+def quote(room, start_date, end_date):
+    return quote_many([(room, start_date, end_date)])[0]
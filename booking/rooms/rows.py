@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Быстрый путь для списков: строки values() вместо экземпляров моделей и
+# заранее собранный список (имя, колонка, преобразование) вместо обхода
+# полей DRF на каждый объект. Формат ответа тот же, что у ModelSerializer.
+
+
+def _decimal(field):
+    coerce = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+    if (
+        not coerce
+        or field.localize
+        or field.normalize_output
+        or field.rounding
+        or field.decimal_places is None
+    ):
+        return field.to_representation
+    exponent = Decimal(1).scaleb(-field.decimal_places)
+
+    # Значения из numeric(p, s) уже с нужным числом знаков, quantize их не меняет
+    def convert(value):
+        return format(value.quantize(exponent), "f")
+
+    return convert
+
+
+def _date(field):
+    if getattr(field, "format", ISO_8601) != ISO_8601:
+        return field.to_representation
+    return lambda value: value.isoformat()
+
+
+def _converter(field):
+    # None — значение из базы уходит в ответ как есть
+    if isinstance(field, serializers.DecimalField):
+        return _decimal(field)
+    if isinstance(field, serializers.DateTimeField):
+        return field.to_representation
+    if isinstance(field, serializers.DateField):
+        return _date(field)
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return None if field.pk_field is None else field.to_representation
+    if isinstance(
+        field,
+        (
+            serializers.IntegerField,
+            serializers.BooleanField,
+            serializers.ChoiceField,
+            serializers.CharField,
+        ),
+    ):
+        return None
+    return field.to_representation
+
+
+class RowSerializer:
+    __slots__ = ("fields", "sources")
+
+    _compiled = {}
+
+    def __init__(self, serializer_class):
+        fields = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if field.source == "*" or "." in field.source:
+                raise ImproperlyConfigured(
+                    f"{serializer_class.__name__}.{name} is not a plain column"
+                )
+            fields.append((name, field.source, _converter(field)))
+        self.fields = tuple(fields)
+        self.sources = tuple(source for _, source, _ in fields)
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        compiled = cls._compiled.get(serializer_class)
+        if compiled is None:
+            compiled = cls._compiled[serializer_class] = cls(serializer_class)
+        return compiled
+
+    def to_representation(self, row):
+        data = {}
+        for name, source, convert in self.fields:
+            value = row[source]
+            data[name] = value if convert is None or value is None else convert(value)
+        return data
+
+    def many(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+
+class RowListMixin:
+    # list() для ModelViewSet через RowSerializer; фильтры и пагинация те же
+    def list(self, request, *args, **kwargs):
+        rows = RowSerializer.for_serializer(self.get_serializer_class())
+        queryset = self.filter_queryset(self.get_queryset()).values(*rows.sources)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rows.many(page))
+        return Response(rows.many(queryset))
@@ -0,0 +1,77 @@
+from django.db.models import Count, Q
+
+from .models import Room
+
+# Поиск комнат по строке и счётчики фасетов для выдачи
+
+# Граница None — без ограничения. Вместимость — [min, max], цена — [min, max)
+CAPACITY_BUCKETS = ((1, 1), (2, 2), (3, 4), (5, None))
+PRICE_BANDS = ((None, 100), (100, 200), (200, 300), (300, None))
+
+
+def _type_matches(token):
+    token = token.casefold()
+    return {
+        value
+        for value, label in Room.ROOM_TYPE_CHOICES
+        if value.startswith(token) or label.casefold().startswith(token)
+    }
+
+
+def match(queryset, text):
+    # Числа — номера комнат, слова — начало типа или его названия ("lux",
+    # "Suite"). Каждое слово должно подойти; разные номера — любой из них.
+    # Условия сводятся к name IN / room_type IN и идут по обычным индексам.
+    numbers = set()
+    for token in text.replace(",", " ").split():
+        if token.isdecimal():
+            numbers.add(int(token))
+            continue
+        types = _type_matches(token)
+        if not types:
+            return queryset.none()
+        queryset = queryset.filter(room_type__in=types)
+    if numbers:
+        queryset = queryset.filter(name__in=numbers)
+    return queryset
+
+
+def _between(field, low, high, upper):
+    condition = Q()
+    if low is not None:
+        condition &= Q(**{f"{field}__gte": low})
+    if high is not None:
+        condition &= Q(**{f"{field}__{upper}": high})
+    return condition
+
+
+def facet_counts(queryset):
+    # Все счётчики — одним запросом: COUNT(*) FILTER (WHERE ...) на корзину
+    aggregates = {"total": Count("id")}
+    for value, _ in Room.ROOM_TYPE_CHOICES:
+        aggregates[f"type_{value}"] = Count("id", filter=Q(room_type=value))
+    for i, (low, high) in enumerate(CAPACITY_BUCKETS):
+        aggregates[f"capacity_{i}"] = Count(
+            "id", filter=_between("capacity", low, high, "lte")
+        )
+    for i, (low, high) in enumerate(PRICE_BANDS):
+        aggregates[f"price_{i}"] = Count(
+            "id", filter=_between("price_per_day", low, high, "lt")
+        )
+    counts = queryset.order_by().aggregate(**aggregates)
+
+    return {
+        "count": counts["total"],
+        "room_type": [
+            {"value": value, "label": label, "count": counts[f"type_{value}"]}
+            for value, label in Room.ROOM_TYPE_CHOICES
+        ],
+        "capacity": [
+            {"min": low, "max": high, "count": counts[f"capacity_{i}"]}
+            for i, (low, high) in enumerate(CAPACITY_BUCKETS)
+        ],
+        "price_per_day": [
+            {"min": low, "max": high, "count": counts[f"price_{i}"]}
+            for i, (low, high) in enumerate(PRICE_BANDS)
+        ],
+    }
@@ -1,6 +1,17 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
-from .models import Booking, MyUser, Room
+from . import availability, cache, holds, occupancy, packing, pricing
+from .authentication import ClaimsRefreshToken
+from .models import ROOM_ALREADY_BOOKED, Booking, BookingArchive, MyUser, Room
+
+ROOM_ON_HOLD = "Room is on hold for the specified dates"
+
+
+def is_overlap_violation(exc):
+    diag = getattr(exc.__cause__, "diag", None)
+    return getattr(diag, "constraint_name", None) == "exclude_overlapping_bookings"
 
 
 class MyUserSerializer(serializers.ModelSerializer):
@@ -10,6 +21,11 @@ class MyUserSerializer(serializers.ModelSerializer):
         extra_kwargs = {"password": {"write_only": True}}
 
 
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    # username и флаги прав попадают в токен, см. ClaimsJWTAuthentication
+    token_class = ClaimsRefreshToken
+
+
 class RoomSerializer(serializers.ModelSerializer):
     class Meta:
         model = Room
@@ -22,6 +38,91 @@ class RoomSerializer(serializers.ModelSerializer):
         )
 
 
+class StayQuerySerializer(serializers.Serializer):
+    MAX_DAYS = 366
+
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+
+    def validate(self, data):
+        days = (data["end_date"] - data["start_date"]).days
+        if days <= 0:
+            raise serializers.ValidationError("Start date must be before end date")
+        if days > self.MAX_DAYS:
+            raise serializers.ValidationError(
+                f"Date range is limited to {self.MAX_DAYS} days"
+            )
+        return data
+
+
+class CalendarQuerySerializer(StayQuerySerializer):
+    encoding = serializers.ChoiceField(choices=["spans", "bitmap"], default="spans")
+
+
+class FlexibleSearchQuerySerializer(StayQuerySerializer):
+    nights = serializers.IntegerField(min_value=1, max_value=30)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+    def validate(self, data):
+        data = super().validate(data)
+        if data["nights"] > (data["end_date"] - data["start_date"]).days:
+            raise serializers.ValidationError("Stay is longer than the date range")
+        return data
+
+
+class RoomSearchQuerySerializer(StayQuerySerializer):
+    ORDERING_FIELDS = ("total_cost", "capacity", "price_per_day")
+
+    ordering = serializers.CharField(required=False, default="total_cost")
+
+    def validate_ordering(self, value):
+        fields = [field.strip() for field in value.split(",") if field.strip()]
+        unknown = [f for f in fields if f.lstrip("-") not in self.ORDERING_FIELDS]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unsupported ordering: {', '.join(unknown)}"
+            )
+        return fields
+
+
+class GroupSearchQuerySerializer(StayQuerySerializer):
+    MAX_GUESTS = 50
+
+    guests = serializers.IntegerField(min_value=1, max_value=MAX_GUESTS)
+    objective = serializers.ChoiceField(
+        choices=packing.OBJECTIVES, default=packing.CHEAPEST
+    )
+    max_rooms = serializers.IntegerField(min_value=1, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=20, default=5)
+
+
+class RoomQuoteSerializer(RoomSerializer):
+    nights = serializers.IntegerField(read_only=True)
+    total_cost = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True
+    )
+
+    class Meta(RoomSerializer.Meta):
+        fields = RoomSerializer.Meta.fields + ("nights", "total_cost")
+
+
+class GroupCombinationSerializer(serializers.Serializer):
+    rooms = RoomQuoteSerializer(many=True, read_only=True)
+    capacity = serializers.IntegerField(read_only=True)
+    total_cost = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True
+    )
+
+
+class StayWindowSerializer(serializers.Serializer):
+    room = RoomSerializer(read_only=True)
+    start_date = serializers.DateField(read_only=True)
+    end_date = serializers.DateField(read_only=True)
+    total_cost = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True
+    )
+
+
 class BookingSerializer(serializers.ModelSerializer):
     user = MyUserSerializer
     room = RoomSerializer
@@ -34,23 +135,215 @@ class BookingSerializer(serializers.ModelSerializer):
         user = self.context["request"].user
         if not user.is_authenticated:
             raise serializers.ValidationError("Authentication required")
-        if user != data["user"]:
+        if user.id != data["user"].id:
             raise serializers.ValidationError("You can't book for somebody else")
 
-        room = data["room"]
         start_date = data["start_date"]
         end_date = data["end_date"]
 
         if start_date > end_date:
             raise serializers.ValidationError("Start date must be before end date")
+        # Свой холд не мешает: так его и подтверждают
+        if holds.held_by_others(data["room"].id, start_date, end_date, user.id):
+            raise serializers.ValidationError(ROOM_ON_HOLD)
 
-        conflicting_bookings = Booking.objects.filter(
-            room=room, start_date__lt=end_date, end_date__gt=start_date
-        )
+        return data
 
-        if conflicting_bookings.exists():
-            raise serializers.ValidationError(
-                "Room is already booked for the specified dates"
+    # Пересечения проверяет ограничение exclude_overlapping_bookings в БД,
+    # отдельный запрос перед сохранением больше не нужен
+    def create(self, validated_data):
+        return self._save_or_conflict(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._save_or_conflict(super().update, instance, validated_data)
+
+    def _save_or_conflict(self, save, *args):
+        try:
+            with transaction.atomic():
+                return save(*args)
+        except IntegrityError as exc:
+            if is_overlap_violation(exc):
+                raise serializers.ValidationError(ROOM_ALREADY_BOOKED)
+            raise
+
+
+class HoldSerializer(StayQuerySerializer):
+    id = serializers.CharField(read_only=True)
+    room = serializers.IntegerField()
+    expires_at = serializers.DateTimeField(read_only=True)
+
+    def validate_room(self, value):
+        if not Room.objects.filter(pk=value).exists():
+            raise serializers.ValidationError("Room does not exist")
+        return value
+
+
+class BookingArchiveSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BookingArchive
+        fields = BookingSerializer.Meta.fields + ("archived_at",)
+
+
+class BulkBookingItemSerializer(serializers.Serializer):
+    # Комнаты и пользователь проверяются разом для всей пачки, а не по одной
+    user = serializers.IntegerField()
+    room = serializers.IntegerField()
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+
+    def validate(self, data):
+        if data["user"] != self.context["request"].user.id:
+            raise serializers.ValidationError("You can't book for somebody else")
+        if data["start_date"] >= data["end_date"]:
+            raise serializers.ValidationError("Start date must be before end date")
+        return data
+
+
+class BulkBookingSerializer(serializers.Serializer):
+    MAX_ITEMS = 500
+
+    bookings = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=MAX_ITEMS
+    )
+    atomic = serializers.BooleanField(default=True)
+
+    def create(self, validated_data):
+        items = validated_data["bookings"]
+        errors = {}
+        valid = {}
+        for index, item in enumerate(items):
+            item_serializer = BulkBookingItemSerializer(data=item, context=self.context)
+            if item_serializer.is_valid():
+                valid[index] = item_serializer.validated_data
+            else:
+                errors[index] = item_serializer.errors
+
+        rooms = Room.objects.in_bulk({data["room"] for data in valid.values()})
+        for index, data in list(valid.items()):
+            if data["room"] not in rooms:
+                errors[index] = {"room": ["Room does not exist"]}
+                del valid[index]
+
+        self.drop_conflicts(valid, errors)
+        user_id = self.context["request"].user.id
+        for index, data in list(valid.items()):
+            if holds.held_by_others(
+                data["room"], data["start_date"], data["end_date"], user_id
+            ):
+                errors[index] = [ROOM_ON_HOLD]
+                del valid[index]
+
+        created = {}
+        while valid and not (errors and validated_data["atomic"]):
+            try:
+                bookings = self.insert(valid, rooms)
+            except IntegrityError as exc:
+                if not is_overlap_violation(exc):
+                    raise
+                # Кто-то успел занять комнату между проверкой и вставкой:
+                # такие брони — в отчёт с ошибкой, остальные пробуем снова
+                if not self.drop_conflicts(valid, errors):
+                    raise serializers.ValidationError(ROOM_ALREADY_BOOKED)
+                continue
+            created = dict(zip(valid, bookings))
+            break
+
+        results = []
+        for index in range(len(items)):
+            if index in created:
+                booking = BookingSerializer(created[index], context=self.context).data
+                results.append(
+                    {"index": index, "status": "created", "booking": booking}
+                )
+            else:
+                results.append(
+                    {
+                        "index": index,
+                        "status": "failed",
+                        "errors": errors.get(index, ["Batch was rolled back"]),
+                    }
+                )
+        return results
+
+    @staticmethod
+    def drop_conflicts(valid, errors):
+        # Пересекающиеся с бронями в базе или между собой — в errors
+        indexes = list(valid)
+        stays = [
+            (valid[i]["room"], valid[i]["start_date"], valid[i]["end_date"])
+            for i in indexes
+        ]
+        conflicts = availability.find_conflicts(stays)
+        for position in conflicts:
+            errors[indexes[position]] = [ROOM_ALREADY_BOOKED]
+            del valid[indexes[position]]
+        return bool(conflicts)
+
+    def insert(self, valid, rooms):
+        user = self.context["request"].user
+        bookings = [
+            Booking(
+                user_id=user.id,
+                room=rooms[data["room"]],
+                start_date=data["start_date"],
+                end_date=data["end_date"],
             )
+            for data in valid.values()
+        ]
+        costs = pricing.quote_many(
+            [(b.room, b.start_date, b.end_date) for b in bookings]
+        )
+        for booking, cost in zip(bookings, costs):
+            booking.cost = cost
+        # Точка сохранения: после нарушения ограничения транзакция запроса
+        # остаётся живой и можно повторить вставку
+        with transaction.atomic():
+            Booking.objects.bulk_create(bookings)
+            occupancy.occupy([(b.room_id, b.start_date, b.end_date) for b in bookings])
+        # bulk_create не шлёт post_save, сбрасываем кэш вручную
+        cache.invalidate_bookings()
+        return bookings
+
 
+class QuoteItemSerializer(serializers.Serializer):
+    room = serializers.IntegerField()
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+
+    def validate(self, data):
+        if data["start_date"] >= data["end_date"]:
+            raise serializers.ValidationError("Start date must be before end date")
         return data
+
+
+class QuoteSerializer(serializers.Serializer):
+    MAX_ITEMS = 1000
+
+    stays = QuoteItemSerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+
+    def validate_stays(self, stays):
+        rooms = Room.objects.in_bulk({stay["room"] for stay in stays})
+        unknown = sorted({stay["room"] for stay in stays} - set(rooms))
+        if unknown:
+            raise serializers.ValidationError(f"Unknown rooms: {unknown}")
+        for stay in stays:
+            stay["room"] = rooms[stay["room"]]
+        return stays
+
+    def to_representation(self, instance):
+        stays = instance["stays"]
+        costs = pricing.quote_many(
+            [(s["room"], s["start_date"], s["end_date"]) for s in stays]
+        )
+        return {
+            "quotes": [
+                {
+                    "room": stay["room"].id,
+                    "start_date": stay["start_date"],
+                    "end_date": stay["end_date"],
+                    "nights": (stay["end_date"] - stay["start_date"]).days,
+                    "cost": str(cost),
+                }
+                for stay, cost in zip(stays, costs)
+            ]
+        }
@@ -0,0 +1,123 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache, jobs, occupancy
+from .authentication import invalidate_user
+from .models import Booking, Job, MyUser, RatePlan, Room, StayDiscount
+
+
+@receiver([post_save, post_delete], sender=Room)
+def invalidate_room_catalogue(sender, **kwargs):
+    cache.invalidate_catalogue()
+
+
+@receiver([post_save, post_delete], sender=MyUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(pre_save, sender=Room)
+def remember_room_price(sender, instance, raw=False, **kwargs):
+    instance._price_before = None
+    if instance.pk and not raw:
+        instance._price_before = (
+            Room.objects.filter(pk=instance.pk)
+            .values_list("price_per_day", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Room)
+def recompute_booking_costs(sender, instance, created, raw=False, **kwargs):
+    before = getattr(instance, "_price_before", None)
+    if created or raw or before is None or before == instance.price_per_day:
+        return
+    # Будущие брони пересчитает run_jobs пачками, а не цикл save() здесь
+    transaction.on_commit(
+        lambda: jobs.enqueue(
+            Job.RECOMPUTE_COSTS, room=instance.pk, since=timezone.now().date()
+        )
+    )
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def invalidate_room_availability(sender, **kwargs):
+    cache.invalidate_bookings()
+
+
+@receiver([post_save, post_delete], sender=RatePlan)
+@receiver([post_save, post_delete], sender=StayDiscount)
+def invalidate_rate_calendars(sender, **kwargs):
+    cache.invalidate_pricing()
+
+
+def cost_scope(rule):
+    # Чьи брони задевает тариф или скидка: комнаты, типа или все
+    if getattr(rule, "room_id", None):
+        return {"room": rule.room_id}
+    if rule.room_type:
+        return {"room_type": rule.room_type}
+    return {}
+
+
+@receiver(pre_save, sender=RatePlan)
+@receiver(pre_save, sender=StayDiscount)
+def remember_cost_scope(sender, instance, raw=False, **kwargs):
+    instance._scope_before = None
+    if instance.pk and not raw:
+        before = sender.objects.filter(pk=instance.pk).first()
+        instance._scope_before = before and cost_scope(before)
+
+
+@receiver([post_save, post_delete], sender=RatePlan)
+@receiver([post_save, post_delete], sender=StayDiscount)
+def recompute_rule_costs(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    scopes = [cost_scope(instance)]
+    before = getattr(instance, "_scope_before", None)
+    if before is not None and before != scopes[0]:
+        scopes.append(before)
+    if {} in scopes:
+        scopes = [{}]
+    since = timezone.now().date()
+
+    def enqueue():
+        for scope in scopes:
+            jobs.enqueue(Job.RECOMPUTE_COSTS, since=since, **scope)
+
+    transaction.on_commit(enqueue)
+
+
+def booked_nights(booking):
+    # Даты могли прийти строками, приводим так же, как это делает поле
+    to_date = Booking._meta.get_field("start_date").to_python
+    return (booking.room_id, to_date(booking.start_date), to_date(booking.end_date))
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booked_nights(sender, instance, raw=False, **kwargs):
+    instance._booked_before = None
+    if instance.pk and not raw:
+        instance._booked_before = (
+            Booking.objects.filter(pk=instance.pk)
+            .values_list("room_id", "start_date", "end_date")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Booking)
+def update_room_occupancy(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, "_booked_before", None)
+    after = booked_nights(instance)
+    if before != after:
+        occupancy.move(before, after)
+
+
+@receiver(post_delete, sender=Booking)
+def release_room_occupancy(sender, instance, **kwargs):
+    occupancy.release([booked_nights(instance)])
@@ -0,0 +1,30 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def assert_within_budget():
+    # Проверяет метрики RequestMetricsMiddleware против бюджета эндпоинта
+    def check(response, queries=None, db_ms=None, serialize_ms=None, max_bytes=None):
+        stats = response.metrics
+        limits = {
+            "queries": (stats["queries"], queries),
+            "db_ms": (stats["db_seconds"] * 1000, db_ms),
+            "serialize_ms": (stats["serialize_seconds"] * 1000, serialize_ms),
+            "max_bytes": (stats["response_bytes"], max_bytes),
+        }
+        over = {
+            name: f"{actual:g} > {limit:g}"
+            for name, (actual, limit) in limits.items()
+            if limit is not None and actual > limit
+        }
+        assert not over, f"{response.wsgi_request.path} is over budget: {over}"
+
+    return check
@@ -1,8 +1,23 @@
 import datetime
+import itertools
+import random
+from decimal import Decimal
+from types import SimpleNamespace
 
 import pytest
+from django.core.management import call_command
+from django.db import IntegrityError
 
-from ..models import Booking, MyUser, Room
+from .. import availability, jobs, occupancy, packing, pricing
+from ..models import (
+    Booking,
+    Job,
+    MyUser,
+    RatePlan,
+    Room,
+    RoomOccupancy,
+    StayDiscount,
+)
 
 
 @pytest.mark.django_db
@@ -48,6 +63,31 @@ class TestBookingModels:
 
         assert booking.cost == 400.00
 
+    def test_overlapping_bookings_rejected_by_database(self):
+        user = MyUser.objects.create(username="testuser", email="test@example.com")
+        room = Room.objects.create(name=101, price_per_day=100.00, capacity=2)
+        Booking.objects.create(
+            user=user,
+            room=room,
+            start_date=datetime.date(2024, 7, 11),
+            end_date=datetime.date(2024, 7, 15),
+        )
+        # День выезда свободен для следующего гостя
+        Booking.objects.create(
+            user=user,
+            room=room,
+            start_date=datetime.date(2024, 7, 15),
+            end_date=datetime.date(2024, 7, 17),
+        )
+
+        with pytest.raises(IntegrityError):
+            Booking.objects.create(
+                user=user,
+                room=room,
+                start_date=datetime.date(2024, 7, 14),
+                end_date=datetime.date(2024, 7, 16),
+            )
+
 
 @pytest.mark.django_db
 class TestRoomModels:
@@ -64,3 +104,400 @@ class TestRoomModels:
         )
 
         assert room.capacity == 2
+
+
+@pytest.mark.django_db
+class TestRoomOccupancy:
+    def setup_method(self, method):
+        self.user = MyUser.objects.create(username="testuser", email="test@example.com")
+        self.room = Room.objects.create(name=101, price_per_day=100.00, capacity=2)
+
+    def booked(self, start_date, end_date):
+        return occupancy.window_bitsets(start_date, end_date).get(self.room.id, 0)
+
+    def test_occupancy_follows_booking_changes(self):
+        booking = Booking.objects.create(
+            user=self.user,
+            room=self.room,
+            start_date=datetime.date(2024, 12, 30),
+            end_date=datetime.date(2025, 1, 2),
+        )
+        assert self.booked(datetime.date(2024, 12, 29), datetime.date(2025, 1, 3)) == (
+            0b01110
+        )
+
+        booking.start_date = datetime.date(2025, 1, 1)
+        booking.save()
+        assert self.booked(datetime.date(2024, 12, 29), datetime.date(2025, 1, 3)) == (
+            0b01000
+        )
+
+        booking.delete()
+        assert self.booked(datetime.date(2024, 12, 29), datetime.date(2025, 1, 3)) == 0
+
+    def test_rebuild_and_verify(self):
+        Booking.objects.create(
+            user=self.user,
+            room=self.room,
+            start_date=datetime.date(2024, 7, 11),
+            end_date=datetime.date(2024, 7, 15),
+        )
+        RoomOccupancy.objects.all().delete()
+        assert occupancy.verify() == [(self.room.id, 2024)]
+
+        call_command("rebuild_occupancy")
+
+        assert occupancy.verify() == []
+        assert self.booked(datetime.date(2024, 7, 10), datetime.date(2024, 7, 16)) == (
+            0b011110
+        )
+
+    def test_available_rooms(self):
+        other = Room.objects.create(name=102, price_per_day=100.00, capacity=4)
+        Booking.objects.create(
+            user=self.user,
+            room=self.room,
+            start_date=datetime.date(2024, 12, 30),
+            end_date=datetime.date(2025, 1, 2),
+        )
+
+        def available(start, end):
+            return list(
+                Room.objects.available(start, end)
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+
+        # Стык годов, ночь выезда свободна, соседние ночи не задеты
+        assert available(datetime.date(2025, 1, 1), datetime.date(2025, 1, 5)) == [
+            other.id
+        ]
+        assert available(datetime.date(2025, 1, 2), datetime.date(2025, 1, 5)) == [
+            self.room.id,
+            other.id,
+        ]
+        assert available(datetime.date(2024, 12, 1), datetime.date(2024, 12, 30)) == [
+            self.room.id,
+            other.id,
+        ]
+        assert list(
+            Room.objects.filter(capacity=2).available(
+                datetime.date(2025, 1, 2), datetime.date(2025, 1, 3)
+            )
+        ) == [self.room]
+
+    def test_available_matches_bitmaps(self):
+        rnd = random.Random(0)
+        rooms = [self.room] + [
+            Room.objects.create(name=102 + i, price_per_day=100.00, capacity=2)
+            for i in range(3)
+        ]
+        for room in rooms:
+            start = datetime.date(2024, 12, 1)
+            for _ in range(6):
+                start += datetime.timedelta(days=rnd.randint(0, 9))
+                end = start + datetime.timedelta(days=rnd.randint(1, 5))
+                Booking.objects.create(
+                    user=self.user, room=room, start_date=start, end_date=end
+                )
+                start = end
+
+        for _ in range(30):
+            start = datetime.date(2024, 11, 25) + datetime.timedelta(
+                days=rnd.randint(0, 70)
+            )
+            end = start + datetime.timedelta(days=rnd.randint(1, 20))
+            booked = set(availability.booked_room_ids(start, end))
+
+            assert (
+                set(Room.objects.available(start, end).values_list("id", flat=True))
+                == {room.id for room in rooms} - booked
+            )
+
+
+@pytest.mark.django_db
+class TestPricing:
+    def setup_method(self, method):
+        self.room = Room.objects.create(
+            name=101, price_per_day=100, capacity=2, room_type="standard"
+        )
+        RatePlan.objects.create(
+            name="Summer",
+            start_date=datetime.date(2024, 7, 1),
+            end_date=datetime.date(2024, 9, 1),
+            price_per_day=120,
+        )
+        RatePlan.objects.create(
+            name="Weekend",
+            room_type="standard",
+            start_date=datetime.date(2024, 1, 1),
+            end_date=datetime.date(2025, 1, 1),
+            weekend_surcharge=50,
+        )
+
+    def test_seasonal_and_weekend_rates(self):
+        # Чт 120, Пт 180, Сб 180, Вс 120
+        cost = pricing.quote(
+            self.room, datetime.date(2024, 7, 4), datetime.date(2024, 7, 8)
+        )
+
+        assert cost == Decimal("600.00")
+
+    def test_room_type_change_recompiles_calendar(self):
+        stay = (datetime.date(2024, 7, 4), datetime.date(2024, 7, 8))
+        assert pricing.quote(self.room, *stay) == Decimal("600.00")
+
+        # Тариф "Weekend" только для standard: надбавка пропадает
+        self.room.room_type = "deluxe"
+        self.room.save()
+
+        assert pricing.quote(self.room, *stay) == Decimal("480.00")
+
+    def test_calendars_shared_between_alike_rooms(self, django_assert_num_queries):
+        rooms = Room.objects.bulk_create(
+            Room(name=200 + i, price_per_day=100, capacity=2) for i in range(300)
+        )
+        RatePlan.objects.create(
+            name="Festival",
+            room=rooms[0],
+            start_date=datetime.date(2024, 7, 7),
+            end_date=datetime.date(2024, 7, 8),
+            price_per_day=200,
+        )
+        stay = (datetime.date(2024, 7, 4), datetime.date(2024, 7, 8))
+        pricing._calendars.clear()
+
+        costs = pricing.quote_many([(room, *stay) for room in rooms])
+
+        assert costs[0] == Decimal("680.00")
+        assert set(costs[1:]) == {Decimal("600.00")}
+        # Один общий календарь и один — для комнаты со своим тарифом
+        assert len(pricing._calendars) == 2
+        with django_assert_num_queries(0):
+            pricing.quote_many([(room, *stay) for room in rooms])
+
+    def test_room_plan_and_stay_discount(self):
+        RatePlan.objects.create(
+            name="Festival",
+            room=self.room,
+            start_date=datetime.date(2024, 7, 7),
+            end_date=datetime.date(2024, 7, 8),
+            price_per_day=200,
+        )
+        StayDiscount.objects.create(min_nights=4, percent=10)
+
+        costs = pricing.quote_many(
+            [
+                (self.room, datetime.date(2024, 7, 4), datetime.date(2024, 7, 8)),
+                (self.room, datetime.date(2024, 12, 31), datetime.date(2025, 1, 2)),
+            ]
+        )
+
+        assert costs == [Decimal("612.00"), Decimal("200.00")]
+
+    def test_window_quotes_match_single_quotes(self):
+        StayDiscount.objects.create(min_nights=3, percent=10)
+        start, end = datetime.date(2024, 12, 20), datetime.date(2025, 1, 10)
+        windows = [(self.room, i) for i in range(18)]
+
+        costs = pricing.quote_windows(windows, start, end, 3)
+
+        assert costs == pricing.quote_many(
+            [
+                (
+                    self.room,
+                    start + datetime.timedelta(days=i),
+                    start + datetime.timedelta(days=i + 3),
+                )
+                for i in range(18)
+            ]
+        )
+
+    def test_booking_uses_pricing(self):
+        user = MyUser.objects.create(username="testuser", email="test@example.com")
+        booking = Booking.objects.create(
+            user=user,
+            room=self.room,
+            start_date=datetime.date(2024, 6, 29),
+            end_date=datetime.date(2024, 7, 2),
+        )
+
+        # Сб 150 (надбавка к базовой цене), Вс 100, Пн 120 (летний тариф)
+        assert booking.cost == Decimal("370.00")
+
+
+class TestFreeStarts:
+    def test_matches_naive_sweep(self):
+        rnd = random.Random(0)
+        for _ in range(200):
+            days = rnd.randint(1, 40)
+            nights = rnd.randint(1, days)
+            bits = rnd.getrandbits(days) & rnd.getrandbits(days)
+
+            starts = list(
+                availability.iter_bits(availability.free_starts(bits, days, nights))
+            )
+
+            assert starts == [
+                i
+                for i in range(days - nights + 1)
+                if not any(bits >> j & 1 for j in range(i, i + nights))
+            ]
+
+
+class TestPacking:
+    @staticmethod
+    def rooms(*specs):
+        return [
+            SimpleNamespace(id=i, capacity=capacity, total_cost=Decimal(cost))
+            for i, (capacity, cost) in enumerate(specs, 1)
+        ]
+
+    def test_cheapest_and_fewest(self):
+        rooms = self.rooms((2, 100), (2, 100), (2, 100), (6, 400), (1, 40))
+
+        cheapest = packing.pack(rooms, 5, limit=2)
+        fewest = packing.pack(rooms, 5, limit=1, objective=packing.FEWEST)
+
+        assert [[r.id for r in combo] for combo in cheapest] == [
+            [1, 2, 5],
+            [1, 2, 3],
+        ]
+        assert [[r.id for r in combo] for combo in fewest] == [[4]]
+
+    def test_no_redundant_rooms_and_max_rooms(self):
+        rooms = self.rooms((2, 10), (2, 10), (2, 10), (1, 1))
+
+        combos = packing.pack(rooms, 4, limit=10)
+        limited = packing.pack(rooms, 4, limit=10, max_rooms=2)
+
+        assert sorted(sorted(r.id for r in combo) for combo in combos) == [
+            [1, 2],
+        ]
+        assert [[r.id for r in combo] for combo in limited] == [[1, 2]]
+        assert packing.pack(rooms, 8) == []
+
+    def test_matches_brute_force(self):
+        rnd = random.Random(0)
+        for _ in range(50):
+            rooms = self.rooms(
+                *((rnd.randint(1, 5), rnd.randint(50, 300)) for _ in range(8))
+            )
+            guests = rnd.randint(1, 12)
+            best = min(
+                (
+                    sum(r.total_cost for r in combo)
+                    for size in range(1, len(rooms) + 1)
+                    for combo in itertools.combinations(rooms, size)
+                    if sum(r.capacity for r in combo) >= guests
+                ),
+                default=None,
+            )
+
+            combos = packing.pack(rooms, guests, limit=3)
+
+            if best is None:
+                assert combos == []
+                continue
+            assert sum(r.total_cost for r in combos[0]) == best
+            for combo in combos:
+                capacity = sum(r.capacity for r in combo)
+                assert capacity >= guests
+                assert capacity - min(r.capacity for r in combo) < guests
+
+
+@pytest.mark.django_db
+class TestJobs:
+    def setup_method(self, method):
+        self.user = MyUser.objects.create(username="testuser", email="test@example.com")
+        self.room = Room.objects.create(name=101, price_per_day=100.00, capacity=2)
+        self.bookings = [
+            Booking.objects.create(
+                user=self.user,
+                room=self.room,
+                start_date=datetime.date(2030, 1, 1) + datetime.timedelta(days=i * 3),
+                end_date=datetime.date(2030, 1, 3) + datetime.timedelta(days=i * 3),
+            )
+            for i in range(5)
+        ]
+
+    def test_price_change_recomputes_costs_in_background(
+        self, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            self.room.price_per_day = Decimal("150.00")
+            self.room.save()
+        job = Job.objects.get()
+        assert (job.kind, job.params["room"]) == (Job.RECOMPUTE_COSTS, self.room.id)
+
+        call_command("run_jobs", "--once", "--chunk-size=2", "--pause=0")
+
+        job.refresh_from_db()
+        assert (job.status, job.processed, job.total) == (Job.DONE, 5, 5)
+        assert {b.cost for b in Booking.objects.all()} == {Decimal("300.00")}
+
+    def test_rate_changes_recompute_costs(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            plan = RatePlan.objects.create(
+                name="Winter",
+                room_type="standard",
+                start_date=datetime.date(2030, 1, 1),
+                end_date=datetime.date(2030, 3, 1),
+                price_per_day=120,
+            )
+        job = Job.objects.get()
+        assert job.params["room_type"] == "standard"
+        call_command("run_jobs", "--once", "--pause=0")
+        assert {b.cost for b in Booking.objects.all()} == {Decimal("240.00")}
+
+        # Тариф перенесли на другую комнату: пересчёт и для прежнего типа
+        other = Room.objects.create(name=102, price_per_day=100.00, capacity=2)
+        with django_capture_on_commit_callbacks(execute=True):
+            plan.room = other
+            plan.save()
+        assert Job.objects.filter(status=Job.QUEUED).count() == 2
+        call_command("run_jobs", "--once", "--pause=0")
+        call_command("run_jobs", "--once", "--pause=0")
+        assert {b.cost for b in Booking.objects.all()} == {Decimal("200.00")}
+
+        with django_capture_on_commit_callbacks(execute=True):
+            StayDiscount.objects.create(min_nights=2, percent=10)
+        call_command("run_jobs", "--once", "--pause=0")
+        assert {b.cost for b in Booking.objects.all()} == {Decimal("180.00")}
+
+    def test_failed_job_resumes_from_cursor(self, monkeypatch):
+        RoomOccupancy.objects.all().delete()
+        job = jobs.enqueue(Job.PURGE_BOOKINGS, before=datetime.date(2030, 1, 10))
+        calls = []
+
+        def flaky_release(stays):
+            calls.append(stays)
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+
+        monkeypatch.setattr(occupancy, "release", flaky_release)
+        with pytest.raises(RuntimeError):
+            jobs.run(jobs.claim(), chunk_size=1, pause=0)
+
+        job.refresh_from_db()
+        assert (job.status, job.processed) == (Job.FAILED, 1)
+        assert Booking.objects.count() == 4
+
+        monkeypatch.undo()
+        jobs.retry(job)
+        jobs.run(jobs.claim(), chunk_size=1, pause=0)
+
+        job.refresh_from_db()
+        assert (job.status, job.processed) == (Job.DONE, 3)
+        assert Booking.objects.count() == 2
+
+    def test_rebuild_occupancy_job(self):
+        RoomOccupancy.objects.all().delete()
+        jobs.enqueue(Job.REBUILD_OCCUPANCY)
+        # Повторная постановка не создаёт дубликат
+        jobs.enqueue(Job.REBUILD_OCCUPANCY)
+        assert Job.objects.count() == 1
+
+        call_command("run_jobs", "--once", "--pause=0")
+
+        assert occupancy.verify() == []
@@ -0,0 +1,159 @@
+import json
+from datetime import date
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .. import availability, occupancy
+from ..models import Booking, MyUser, Room, RoomOccupancy
+
+ROOMS = 5000
+USERS = 1000
+STAYS_PER_ROOM = 40
+
+# Таблицы, которые в продакшене большие: seq scan по ним — регрессия
+LARGE_TABLES = {
+    Room._meta.db_table,
+    Booking._meta.db_table,
+    RoomOccupancy._meta.db_table,
+    MyUser._meta.db_table,
+}
+
+
+@pytest.fixture(scope="module")
+def seeded(django_db_setup, django_db_blocker):
+    # Около 200 тысяч броней за ~10 лет, данные живут до конца модуля
+    with django_db_blocker.unblock():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {MyUser._meta.db_table} (password, is_superuser, username,
+                    first_name, last_name, email, is_staff, is_active, date_joined)
+                SELECT '', false, 'user' || g, '', '', 'user' || g || '@example.com',
+                    false, true, now()
+                FROM generate_series(1, %s) g
+                """,
+                [USERS],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {Room._meta.db_table} (name, price_per_day, capacity, room_type)
+                SELECT g %% 1000, 50 + g %% 400, 1 + g %% 6,
+                    (ARRAY['standard', 'deluxe', 'suite'])[1 + g %% 3]
+                FROM generate_series(1, %s) g
+                """,
+                [ROOMS],
+            )
+            cursor.execute(
+                f"""
+                WITH first_user AS (SELECT min(id) AS id FROM {MyUser._meta.db_table})
+                INSERT INTO {Booking._meta.db_table} (user_id, room_id, start_date, end_date, cost)
+                SELECT first_user.id + (r.id * %s + k) %% %s, r.id,
+                    date '2016-01-01' + k * 90 + (r.id %% 30)::int,
+                    date '2016-01-04' + k * 90 + (r.id %% 30)::int,
+                    3 * r.price_per_day
+                FROM {Room._meta.db_table} r, first_user, generate_series(0, %s) k
+                """,
+                [STAYS_PER_ROOM, USERS, STAYS_PER_ROOM - 1],
+            )
+        occupancy.rebuild()
+        with connection.cursor() as cursor:
+            for model in (MyUser, Room, Booking, RoomOccupancy):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+    yield
+
+    with django_db_blocker.unblock():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"TRUNCATE {Booking._meta.db_table}, {RoomOccupancy._meta.db_table}, "
+                f"{Room._meta.db_table}, {MyUser._meta.db_table} CASCADE"
+            )
+
+
+def seq_scans(plan):
+    found = []
+    if (
+        plan.get("Node Type") == "Seq Scan"
+        and plan.get("Relation Name") in LARGE_TABLES
+    ):
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def assert_no_seq_scans(queries):
+    selects = [
+        q["sql"] for q in queries if q["sql"].lstrip().upper().startswith("SELECT")
+    ]
+    assert selects, "no SELECT queries were captured"
+    with connection.cursor() as cursor:
+        for sql in selects:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            raw = cursor.fetchone()[0]
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+            assert not seq_scans(plan), f"sequential scan in plan for: {sql}"
+
+
+def capture(fn):
+    with CaptureQueriesContext(connection) as context:
+        fn()
+    return context.captured_queries
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("seeded")
+class TestQueryPlans:
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {},
+            {"ordering": "price_per_day"},
+            {"ordering": "-capacity"},
+            {"capacity": 3},
+            {"room_type": "suite"},
+            {"name": 42},
+            {"start_date": "2020-03-01", "end_date": "2020-03-05"},
+        ],
+    )
+    def test_room_list(self, params):
+        client = APIClient()
+        assert_no_seq_scans(capture(lambda: client.get("/api/rooms/", params)))
+
+    def test_room_detail(self):
+        room = Room.objects.order_by("id").last()
+        client = APIClient()
+        assert_no_seq_scans(capture(lambda: client.get(f"/api/rooms/{room.id}/")))
+
+    def test_staff_booking_list(self):
+        staff = MyUser.objects.create_superuser(
+            username="staff", email="staff@example.com", password="staff"
+        )
+        client = APIClient()
+        client.force_authenticate(user=staff)
+        assert_no_seq_scans(capture(lambda: client.get("/api/bookings/")))
+
+    def test_user_booking_list(self):
+        user = MyUser.objects.order_by("id").last()
+        client = APIClient()
+        client.force_authenticate(user=user)
+        assert_no_seq_scans(capture(lambda: client.get("/api/bookings/")))
+
+    def test_single_room_availability(self):
+        room = Room.objects.order_by("id").first()
+        assert_no_seq_scans(
+            capture(
+                lambda: availability.is_room_available(
+                    room.id, date(2020, 3, 1), date(2020, 3, 5)
+                )
+            )
+        )
+
+    def test_booking_conflicts(self):
+        rooms = list(Room.objects.order_by("id").values_list("id", flat=True)[:3])
+        stays = [(room_id, date(2020, 3, 1), date(2020, 3, 5)) for room_id in rooms]
+        assert_no_seq_scans(capture(lambda: availability.find_conflicts(stays)))
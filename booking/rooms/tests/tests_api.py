@@ -1,8 +1,25 @@
+import datetime
+from decimal import Decimal
+from unittest import mock
+
 import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
-from rooms.models import Booking, MyUser, Room
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from rooms import availability, metrics, occupancy
+from rooms.archive import archive_chunk
+from rooms.middleware import RequestMetricsMiddleware
+from rooms.models import Booking, BookingArchive, IdempotencyKey, MyUser, Room
+from rooms.renderers import ORJSONRenderer
+from rooms.serializers import ROOM_ALREADY_BOOKED, BookingSerializer, RoomSerializer
+from rooms.views import BookingViewSet
 
 
 @pytest.fixture
@@ -102,6 +119,428 @@ class TestRoomAPI:
         response = client.delete(url)
         assert response.status_code == status.HTTP_204_NO_CONTENT
 
+    def test_room_list_filtered_by_dates(self):
+        user = MyUser.objects.create_user(
+            username="guest", email="guest@example.com", password="password"
+        )
+        booked = Room.objects.create(name=105, price_per_day=100.00, capacity=2)
+        checkout = Room.objects.create(name=106, price_per_day=100.00, capacity=2)
+        free = Room.objects.create(name=107, price_per_day=100.00, capacity=2)
+        Booking.objects.create(
+            user=user,
+            room=booked,
+            start_date=datetime.date(2024, 7, 1),
+            end_date=datetime.date(2024, 7, 8),
+        )
+        Booking.objects.create(
+            user=user,
+            room=checkout,
+            start_date=datetime.date(2024, 7, 1),
+            end_date=datetime.date(2024, 7, 5),
+        )
+
+        client = APIClient()
+        response = client.get(
+            "/api/rooms/", {"start_date": "2024-07-05", "end_date": "2024-07-10"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        ids = {room["id"] for room in response.data["results"]}
+        assert ids == {checkout.id, free.id}
+
+    def test_room_list_window_without_nights(self):
+        user = MyUser.objects.create_user(
+            username="guest", email="guest@example.com", password="password"
+        )
+        room = Room.objects.create(name=108, price_per_day=100.00, capacity=2)
+        Booking.objects.create(
+            user=user,
+            room=room,
+            start_date=datetime.date(2024, 1, 1),
+            end_date=datetime.date(2024, 1, 3),
+        )
+        client = APIClient()
+
+        # Пустое и перевёрнутое окно не занимают ни одной ночи
+        for start, end in (("2024-06-01", "2024-06-01"), ("2024-06-05", "2024-06-01")):
+            response = client.get("/api/rooms/", {"start_date": start, "end_date": end})
+            assert [r["id"] for r in response.data["results"]] == [room.id]
+            response = client.get(
+                "/api/async/rooms/available/", {"start_date": start, "end_date": end}
+            )
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_room_list_cursor_pagination(self):
+        for name in range(110, 115):
+            Room.objects.create(name=name, price_per_day=100.00, capacity=2)
+        client = APIClient()
+
+        names = []
+        url = "/api/rooms/?ordering=price_per_day&page_size=2"
+        while url:
+            response = client.get(url)
+            names.extend(room["name"] for room in response.data["results"])
+            url = response.data["next"]
+
+        assert names == [110, 111, 112, 113, 114]
+
+    def test_room_list_cursor_past_many_ties(self):
+        # Больше 1000 равных значений: курсор с offset на них ломался
+        Room.objects.bulk_create(
+            Room(name=i, price_per_day=100, capacity=2) for i in range(1, 1201)
+        )
+        client = APIClient()
+
+        for ordering in ("capacity", "-capacity"):
+            ids = []
+            url = f"/api/rooms/?ordering={ordering}&page_size=200"
+            while url:
+                response = client.get(url)
+                assert response.status_code == status.HTTP_200_OK
+                ids.extend(room["id"] for room in response.data["results"])
+                url = response.data["next"]
+            expected = sorted(ids, reverse=ordering.startswith("-"))
+            assert ids == expected and len(set(ids)) == 1200
+
+        previous = client.get(response.data["previous"])
+        assert [room["id"] for room in previous.data["results"]] == ids[-400:-200]
+
+    @pytest.mark.parametrize(
+        "url, params",
+        [
+            ("/api/rooms/calendar/", {"capacity": "abc"}),
+            ("/api/rooms/search/", {"capacity": "abc"}),
+            ("/api/rooms/flexible/", {"capacity": "abc", "nights": 2}),
+            ("/api/rooms/group-search/", {"price_per_day": "abc", "guests": 3}),
+        ],
+    )
+    def test_room_actions_reject_invalid_filters(self, url, params):
+        Room.objects.create(name=117, price_per_day=100.00, capacity=2)
+        dates = {"start_date": "2024-07-01", "end_date": "2024-07-11"}
+
+        response = APIClient().get(url, dict(dates, **params))
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.data) == set(params) - {"nights", "guests"}
+
+    def test_room_calendar(self, django_assert_num_queries):
+        user = MyUser.objects.create_user(
+            username="guest", email="guest@example.com", password="password"
+        )
+        room = Room.objects.create(name=115, price_per_day=100.00, capacity=2)
+        Room.objects.create(name=116, price_per_day=100.00, capacity=4)
+        for start, end in (
+            (datetime.date(2024, 6, 28), datetime.date(2024, 7, 3)),
+            (datetime.date(2024, 7, 5), datetime.date(2024, 7, 6)),
+        ):
+            Booking.objects.create(user=user, room=room, start_date=start, end_date=end)
+        client = APIClient()
+        params = {"start_date": "2024-07-01", "end_date": "2024-07-11"}
+
+        with django_assert_num_queries(2):
+            response = client.get("/api/rooms/calendar/", params)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["days"] == 10
+        assert response.data["rooms"] == [
+            {"id": room.id, "name": 115, "booked": [[0, 2], [4, 1]]},
+            {"id": room.id + 1, "name": 116, "booked": []},
+        ]
+
+        response = client.get(
+            "/api/rooms/calendar/", dict(params, encoding="bitmap", capacity=2)
+        )
+        assert response.data["rooms"] == [
+            {"id": room.id, "name": 115, "booked": "EwA="},
+        ]
+
+    def test_room_quote(self):
+        room = Room.objects.create(name=117, price_per_day=100.00, capacity=2)
+        client = APIClient()
+
+        response = client.post(
+            "/api/rooms/quote/",
+            {
+                "stays": [
+                    {
+                        "room": room.id,
+                        "start_date": "2024-07-05",
+                        "end_date": "2024-07-08",
+                    },
+                    {
+                        "room": room.id,
+                        "start_date": "2024-07-05",
+                        "end_date": "2024-07-06",
+                    },
+                ]
+            },
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [q["cost"] for q in response.data["quotes"]] == ["300.00", "100.00"]
+        assert response.data["quotes"][0]["nights"] == 3
+
+    def test_room_search_with_quotes(self, django_assert_max_num_queries):
+        user = MyUser.objects.create_user(
+            username="guest", email="guest@example.com", password="password"
+        )
+        cheap = Room.objects.create(name=118, price_per_day=80.00, capacity=2)
+        large = Room.objects.create(name=119, price_per_day=150.00, capacity=4)
+        booked = Room.objects.create(name=120, price_per_day=50.00, capacity=2)
+        Booking.objects.create(
+            user=user,
+            room=booked,
+            start_date=datetime.date(2024, 7, 5),
+            end_date=datetime.date(2024, 7, 6),
+        )
+        client = APIClient()
+        params = {"start_date": "2024-07-05", "end_date": "2024-07-07"}
+
+        with django_assert_max_num_queries(4):
+            response = client.get("/api/rooms/search/", params)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [(r["id"], r["total_cost"]) for r in response.data] == [
+            (cheap.id, "160.00"),
+            (large.id, "300.00"),
+        ]
+
+        response = client.get(
+            "/api/rooms/search/", dict(params, ordering="-capacity,total_cost")
+        )
+        assert [r["id"] for r in response.data] == [large.id, cheap.id]
+
+    def test_room_group_search(self, django_assert_max_num_queries):
+        user = MyUser.objects.create_user(
+            username="guest", email="guest@example.com", password="password"
+        )
+        double = Room.objects.create(name=121, price_per_day=80.00, capacity=2)
+        single = Room.objects.create(name=122, price_per_day=50.00, capacity=1)
+        suite = Room.objects.create(name=123, price_per_day=200.00, capacity=4)
+        booked = Room.objects.create(name=124, price_per_day=10.00, capacity=4)
+        Booking.objects.create(
+            user=user,
+            room=booked,
+            start_date=datetime.date(2024, 7, 5),
+            end_date=datetime.date(2024, 7, 6),
+        )
+        client = APIClient()
+        params = {"start_date": "2024-07-05", "end_date": "2024-07-07", "guests": 3}
+
+        with django_assert_max_num_queries(4):
+            response = client.get("/api/rooms/group-search/", params)
+
+        assert response.status_code == status.HTTP_200_OK
+        combos = response.data["combinations"]
+        assert [[r["id"] for r in c["rooms"]] for c in combos] == [
+            [double.id, single.id],
+            [suite.id],
+        ]
+        assert (combos[0]["capacity"], combos[0]["total_cost"]) == (3, "260.00")
+
+        response = client.get(
+            "/api/rooms/group-search/", dict(params, objective="rooms", limit=1)
+        )
+        assert [r["id"] for r in response.data["combinations"][0]["rooms"]] == [
+            suite.id
+        ]
+
+        response = client.get("/api/rooms/group-search/", dict(params, guests=0))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_room_flexible_search(self, django_assert_max_num_queries):
+        user = MyUser.objects.create_user(
+            username="guest", email="guest@example.com", password="password"
+        )
+        cheap = Room.objects.create(
+            name=125, price_per_day=80.00, capacity=2, room_type="standard"
+        )
+        Room.objects.create(
+            name=126, price_per_day=50.00, capacity=2, room_type="suite"
+        )
+        dear = Room.objects.create(
+            name=127, price_per_day=90.00, capacity=2, room_type="standard"
+        )
+        # У дешёвой комнаты свободны только 3-5 и 8-10 марта
+        for start, end in ((1, 3), (5, 8)):
+            Booking.objects.create(
+                user=user,
+                room=cheap,
+                start_date=datetime.date(2024, 3, start),
+                end_date=datetime.date(2024, 3, end),
+            )
+        client = APIClient()
+        params = {
+            "start_date": "2024-03-01",
+            "end_date": "2024-03-10",
+            "nights": 2,
+            "room_type": "standard",
+            "limit": 3,
+        }
+
+        with django_assert_max_num_queries(5):
+            response = client.get("/api/rooms/flexible/", params)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [
+            (w["room"]["id"], w["start_date"], w["end_date"], w["total_cost"])
+            for w in response.data["windows"]
+        ] == [
+            (cheap.id, "2024-03-03", "2024-03-05", "160.00"),
+            (cheap.id, "2024-03-08", "2024-03-10", "160.00"),
+            (dear.id, "2024-03-01", "2024-03-03", "180.00"),
+        ]
+
+        response = client.get("/api/rooms/flexible/", dict(params, nights=10))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_room_list_dates_combine_with_filters(self, django_assert_num_queries):
+        user = MyUser.objects.create_user(
+            username="guest", email="guest@example.com", password="password"
+        )
+        small = Room.objects.create(name=128, price_per_day=90.00, capacity=2)
+        large = Room.objects.create(name=129, price_per_day=70.00, capacity=4)
+        busy = Room.objects.create(name=130, price_per_day=60.00, capacity=4)
+        Booking.objects.create(
+            user=user,
+            room=busy,
+            start_date=datetime.date(2024, 7, 6),
+            end_date=datetime.date(2024, 7, 8),
+        )
+        client = APIClient()
+        params = {
+            "start_date": "2024-07-05",
+            "end_date": "2024-07-07",
+            "ordering": "price_per_day",
+        }
+
+        with django_assert_num_queries(1):
+            response = client.get("/api/rooms/", params)
+        assert [r["id"] for r in response.data["results"]] == [large.id, small.id]
+
+        response = client.get("/api/rooms/", dict(params, capacity=4))
+        assert [r["id"] for r in response.data["results"]] == [large.id]
+
+        response = client.get("/api/rooms/", dict(params, room_name=128))
+        assert [r["id"] for r in response.data["results"]] == [small.id]
+
+    def test_room_facets(self, django_assert_num_queries):
+        user = MyUser.objects.create_user(
+            username="guest", email="guest@example.com", password="password"
+        )
+        for name, price, capacity, room_type in (
+            (131, 80, 1, "standard"),
+            (132, 150, 2, "standard"),
+            (133, 250, 4, "deluxe"),
+            (134, 400, 6, "suite"),
+        ):
+            room = Room.objects.create(
+                name=name, price_per_day=price, capacity=capacity, room_type=room_type
+            )
+        Booking.objects.create(
+            user=user,
+            room=room,
+            start_date=datetime.date(2024, 7, 5),
+            end_date=datetime.date(2024, 7, 6),
+        )
+        client = APIClient()
+
+        # Страница комнат и все счётчики: два запроса
+        with django_assert_num_queries(2):
+            response = client.get("/api/rooms/facets/", {"page_size": 2})
+
+        facets = response.data["facets"]
+        assert len(response.data["results"]) == 2
+        assert facets["count"] == 4
+        assert [f["count"] for f in facets["room_type"]] == [2, 1, 1]
+        assert [f["count"] for f in facets["capacity"]] == [1, 1, 1, 1]
+        assert [f["count"] for f in facets["price_per_day"]] == [1, 1, 1, 1]
+
+        # Без дат счётчики из кэша, на другой странице тоже
+        with django_assert_num_queries(1):
+            response = client.get(
+                "/api/rooms/facets/", {"page_size": 1, "ordering": "capacity"}
+            )
+        assert response.data["facets"] == facets
+
+        response = client.get(
+            "/api/rooms/facets/", {"start_date": "2024-07-05", "end_date": "2024-07-06"}
+        )
+        assert response.data["facets"]["count"] == 3
+        assert [f["count"] for f in response.data["facets"]["room_type"]] == [2, 1, 0]
+
+        response = client.get("/api/rooms/facets/", {"q": "stand"})
+        assert [r["name"] for r in response.data["results"]] == [131, 132]
+        assert response.data["facets"]["count"] == 2
+
+    def test_room_text_search(self):
+        standard = Room.objects.create(
+            name=135, price_per_day=80, capacity=2, room_type="standard"
+        )
+        deluxe = Room.objects.create(
+            name=136, price_per_day=120, capacity=2, room_type="deluxe"
+        )
+        client = APIClient()
+
+        def found(q):
+            response = client.get("/api/rooms/", {"q": q})
+            return [r["id"] for r in response.data["results"]]
+
+        assert found("Delu") == [deluxe.id]
+        assert found("135 136") == [standard.id, deluxe.id]
+        assert found("standard 136") == []
+        assert found("penthouse") == []
+        # isdigit() верно и для "²", но int() на нём падает
+        assert found("²") == []
+        assert found("٣٥١") == []
+        assert found("99999999999") == []
+        response = client.get("/api/rooms/facets/", {"q": "²"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["facets"]["count"] == 0
+
+    def test_room_list_served_from_cache(self, django_assert_num_queries):
+        Room.objects.create(name=108, price_per_day=100.00, capacity=2)
+        client = APIClient()
+        first = client.get("/api/rooms/", {"capacity": "2", "ordering": "capacity"})
+
+        with django_assert_num_queries(0):
+            second = client.get(
+                "/api/rooms/", {"ordering": "capacity", "capacity": "2"}
+            )
+
+        assert second.data == first.data
+
+    def test_room_cache_invalidated_on_changes(self):
+        user = MyUser.objects.create_user(
+            username="guest", email="guest@example.com", password="password"
+        )
+        room = Room.objects.create(name=109, price_per_day=100.00, capacity=2)
+        client = APIClient()
+        dates = {"start_date": "2024-07-05", "end_date": "2024-07-10"}
+        assert len(client.get("/api/rooms/", dates).data["results"]) == 1
+
+        Booking.objects.create(
+            user=user,
+            room=room,
+            start_date=datetime.date(2024, 7, 5),
+            end_date=datetime.date(2024, 7, 6),
+        )
+        assert len(client.get("/api/rooms/", dates).data["results"]) == 0
+
+        room.price_per_day = 120
+        room.save()
+        assert client.get(f"/api/rooms/{room.id}/").data["price_per_day"] == "120.00"
+
+    def test_room_cache_stats(self, authenticated_client_admin):
+        client = APIClient()
+        client.get("/api/rooms/")
+        client.get("/api/rooms/")
+
+        response = authenticated_client_admin.get("/api/rooms/cache-stats/")
+
+        assert response.data == {"hits": 1, "misses": 1}
+
 
 @pytest.mark.django_db
 class TestUserApi:
@@ -177,7 +616,7 @@ class TestUserApi:
         client = APIClient()
         response = client.get(url)
 
-        assert response.data == []
+        assert response.data["results"] == []
 
 
 @pytest.mark.django_db
@@ -215,13 +654,217 @@ class TestBookingApi:
         assert response.status_code == status.HTTP_201_CREATED
         assert Booking.objects.filter(user=self.user).exists()
 
+    def test_booking_at_the_end_of_the_calendar(self):
+        # Ночи 9999 года: у него нет следующего 1 января
+        dates = {"start_date": "9999-12-29", "end_date": "9999-12-31"}
+        response = self.client.post(
+            reverse("bookings-list"),
+            dict(dates, user=self.user.id, room=self.room.id),
+            format="json",
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["cost"] == "200.00"
+
+        for url in ("/api/rooms/", "/api/rooms/search/", "/api/async/rooms/available/"):
+            response = self.client.get(url, dates)
+            assert response.status_code == status.HTTP_200_OK
+        response = self.client.get(
+            "/api/rooms/", {"start_date": "9999-12-30", "end_date": "9999-12-31"}
+        )
+        assert response.data["results"] == []
+
+    def test_create_overlapping_booking(self):
+        Booking.objects.create(
+            user=self.user,
+            room=self.room,
+            start_date=datetime.date(2024, 7, 5),
+            end_date=datetime.date(2024, 7, 10),
+        )
+        url = reverse("bookings-list")
+        response = self.client.post(
+            url,
+            {
+                "user": self.user.id,
+                "room": self.room.id,
+                "start_date": "2024-07-08",
+                "end_date": "2024-07-12",
+            },
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data == ["Room is already booked for the specified dates"]
+        assert Booking.objects.filter(room=self.room).count() == 1
+
+    def test_bulk_create_bookings(self):
+        other_room = Room.objects.create(name="102", capacity=3, price_per_day=150)
+        url = reverse("bookings-bulk")
+        response = self.client.post(
+            url,
+            {
+                "bookings": [
+                    {
+                        "user": self.user.id,
+                        "room": self.room.id,
+                        "start_date": "2024-07-05",
+                        "end_date": "2024-07-10",
+                    },
+                    {
+                        "user": self.user.id,
+                        "room": other_room.id,
+                        "start_date": "2024-07-05",
+                        "end_date": "2024-07-07",
+                    },
+                ]
+            },
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        costs = [result["booking"]["cost"] for result in response.data["results"]]
+        assert costs == ["500.00", "300.00"]
+        assert Booking.objects.filter(user=self.user).count() == 2
+
+    def test_bulk_create_atomic_rolls_back_on_conflict(self):
+        url = reverse("bookings-bulk")
+        item = {
+            "user": self.user.id,
+            "room": self.room.id,
+            "start_date": "2024-07-05",
+            "end_date": "2024-07-10",
+        }
+        response = self.client.post(
+            url,
+            {"bookings": [item, dict(item, start_date="2024-07-08")]},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        statuses = [result["status"] for result in response.data["results"]]
+        assert statuses == ["failed", "failed"]
+        assert not Booking.objects.exists()
+
+    def test_bulk_create_best_effort(self):
+        Booking.objects.create(
+            user=self.user,
+            room=self.room,
+            start_date=datetime.date(2024, 7, 1),
+            end_date=datetime.date(2024, 7, 6),
+        )
+        url = reverse("bookings-bulk")
+        item = {
+            "user": self.user.id,
+            "room": self.room.id,
+            "start_date": "2024-07-05",
+            "end_date": "2024-07-10",
+        }
+        response = self.client.post(
+            url,
+            {
+                "atomic": False,
+                "bookings": [
+                    item,
+                    dict(item, start_date="2024-07-06"),
+                    dict(item, room=0),
+                ],
+            },
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_207_MULTI_STATUS
+        statuses = [result["status"] for result in response.data["results"]]
+        assert statuses == ["failed", "created", "failed"]
+        assert Booking.objects.filter(room=self.room).count() == 2
+
+    @pytest.mark.parametrize("atomic", [False, True])
+    def test_bulk_create_concurrent_booking(self, atomic):
+        # Бронь появилась после проверки: первая find_conflicts её не видит
+        Booking.objects.create(
+            user=self.user,
+            room=self.room,
+            start_date=datetime.date(2024, 7, 1),
+            end_date=datetime.date(2024, 7, 6),
+        )
+        find_conflicts = availability.find_conflicts
+        calls = []
+
+        def late_conflicts(stays):
+            calls.append(stays)
+            return set() if len(calls) == 1 else find_conflicts(stays)
+
+        item = {
+            "user": self.user.id,
+            "room": self.room.id,
+            "start_date": "2024-07-05",
+            "end_date": "2024-07-10",
+        }
+        with mock.patch.object(availability, "find_conflicts", late_conflicts):
+            response = self.client.post(
+                reverse("bookings-bulk"),
+                {
+                    "atomic": atomic,
+                    "bookings": [item, dict(item, start_date="2024-07-06")],
+                },
+                format="json",
+            )
+
+        results = response.data["results"]
+        assert results[0] == {
+            "index": 0,
+            "status": "failed",
+            "errors": [ROOM_ALREADY_BOOKED],
+        }
+        if atomic:
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+            assert results[1]["status"] == "failed"
+            assert Booking.objects.filter(room=self.room).count() == 1
+        else:
+            assert response.status_code == status.HTTP_207_MULTI_STATUS
+            assert results[1]["status"] == "created"
+            assert Booking.objects.filter(room=self.room).count() == 2
+
+    def test_export_bookings_csv(self):
+        booking = Booking.objects.create(**self.booking_data)
+        other = MyUser.objects.create_user(
+            username="other", email="other@example.com", password="password"
+        )
+        Booking.objects.create(
+            **dict(
+                self.booking_data,
+                user=other,
+                start_date=datetime.date(2024, 8, 1),
+                end_date=datetime.date(2024, 8, 2),
+            )
+        )
+
+        response = self.client.get(reverse("bookings-export"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "text/csv"
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        assert lines == [
+            "id,user,room,start_date,end_date,cost",
+            f"{booking.id},{self.user.id},{self.room.id},2024-07-05,2024-07-10,500.00",
+        ]
+
+    def test_export_bookings_ndjson(self):
+        booking = Booking.objects.create(**self.booking_data)
+
+        response = self.client.get(reverse("bookings-export"), {"fmt": "ndjson"})
+
+        content = b"".join(response.streaming_content).decode()
+        assert content == (
+            f'{{"id":{booking.id},"user":{self.user.id},"room":{self.room.id},'
+            '"start_date":"2024-07-05","end_date":"2024-07-10","cost":"500.00"}\n'
+        )
+
     def test_get_booking_list(self):
         Booking.objects.create(**self.booking_data)
         url = reverse("bookings-list")
         response = self.client.get(url)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 1
+        assert len(response.data["results"]) == 1
 
     def test_update_booking(self):
         booking = Booking.objects.create(**self.booking_data)
@@ -271,4 +914,603 @@ class TestBookingApi:
         url = reverse("bookings-list")
         response = self.client.get(url)
 
-        assert response.data == []
+        assert response.data["results"] == []
+
+
+@pytest.mark.django_db
+class TestAsyncApi:
+
+    def setup_method(self, method):
+        self.client = APIClient()
+        self.user = MyUser.objects.create_user(
+            username="testuser", email="testuser@example.com", password="testpassword"
+        )
+        self.booked = Room.objects.create(name=201, capacity=2, price_per_day=100)
+        self.free = Room.objects.create(name=202, capacity=4, price_per_day=150)
+        self.booking = Booking.objects.create(
+            user=self.user,
+            room=self.booked,
+            start_date=datetime.date(2024, 7, 5),
+            end_date=datetime.date(2024, 7, 10),
+        )
+
+    def test_room_list(self):
+        response = self.client.get("/api/async/rooms/", {"capacity": 4})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            "next_after": None,
+            "results": [
+                {
+                    "id": self.free.id,
+                    "name": 202,
+                    "price_per_day": "150.00",
+                    "capacity": 4,
+                    "room_type": "standard",
+                }
+            ],
+        }
+
+    def test_room_detail(self):
+        response = self.client.get(f"/api/async/rooms/{self.booked.id}/")
+
+        assert response.json()["name"] == 201
+        assert self.client.get("/api/async/rooms/0/").status_code == 404
+
+    def test_room_availability(self, django_assert_num_queries):
+        dates = {"start_date": "2024-07-08", "end_date": "2024-07-12"}
+        # Свободные комнаты — одним запросом с анти-join, без списка id
+        with django_assert_num_queries(1) as captured:
+            response = self.client.get("/api/async/rooms/available/", dates)
+        assert "NOT EXISTS" in captured.captured_queries[0]["sql"]
+
+        assert [room["id"] for room in response.json()["results"]] == [self.free.id]
+
+        response = self.client.get(
+            "/api/async/rooms/available/", dict(dates, room=self.booked.id)
+        )
+        assert response.json() == {"room": self.booked.id, "available": False}
+
+    def test_my_bookings(self):
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        response = self.client.get("/api/async/bookings/")
+
+        assert [b["id"] for b in response.json()["results"]] == [self.booking.id]
+
+    def test_my_bookings_unauthenticated(self):
+        response = self.client.get("/api/async/bookings/")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+# Бюджеты эндпоинтов: SQL-запросы на запрос, время в базе и на рендеринг (мс),
+# размер ответа в байтах. Рост числа запросов с объёмом данных — это N+1.
+BUDGETS = {
+    "rooms-list": {"queries": 1, "db_ms": 200, "serialize_ms": 100, "max_bytes": 8_000},
+    "rooms-detail": {"queries": 1, "db_ms": 100, "serialize_ms": 50, "max_bytes": 500},
+    "rooms-calendar": {"queries": 2, "db_ms": 200, "serialize_ms": 100},
+    "rooms-search": {"queries": 4, "db_ms": 200, "serialize_ms": 100},
+    "rooms-group-search": {"queries": 4, "db_ms": 200, "serialize_ms": 100},
+    "rooms-flexible": {"queries": 4, "db_ms": 200, "serialize_ms": 100},
+    "rooms-facets": {"queries": 2, "db_ms": 200, "serialize_ms": 100},
+    "bookings-list": {"queries": 1, "db_ms": 200, "serialize_ms": 100},
+    "bookings-detail": {"queries": 1, "db_ms": 100, "serialize_ms": 50},
+    "users-list": {"queries": 1, "db_ms": 100, "serialize_ms": 50},
+    "async-rooms-available": {"queries": 2, "db_ms": 200},
+    "async-bookings-list": {"queries": 2, "db_ms": 200},
+}
+
+DATES = {"start_date": "2024-07-05", "end_date": "2024-07-08"}
+
+
+@pytest.mark.django_db
+class TestEndpointBudgets:
+
+    def setup_method(self, method):
+        self.user = MyUser.objects.create_user(
+            username="budget", email="budget@example.com", password="password"
+        )
+        rooms = Room.objects.bulk_create(
+            Room(name=300 + i, price_per_day=100 + i, capacity=1 + i % 4)
+            for i in range(30)
+        )
+        # Каждая бронь в своей комнате: так N+1 по room сразу виден
+        self.bookings = [
+            Booking.objects.create(
+                user=self.user,
+                room=room,
+                start_date=datetime.date(2024, 7, 1) + datetime.timedelta(days=i),
+                end_date=datetime.date(2024, 7, 3) + datetime.timedelta(days=i),
+            )
+            for i, room in enumerate(rooms)
+        ]
+        self.room = rooms[0]
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    @pytest.mark.parametrize(
+        "endpoint, url, params",
+        [
+            ("rooms-list", "/api/rooms/", {}),
+            ("rooms-list", "/api/rooms/", DATES),
+            ("rooms-calendar", "/api/rooms/calendar/", DATES),
+            ("rooms-search", "/api/rooms/search/", DATES),
+            ("rooms-flexible", "/api/rooms/flexible/", dict(DATES, nights=2)),
+            ("rooms-facets", "/api/rooms/facets/", DATES),
+            (
+                "rooms-group-search",
+                "/api/rooms/group-search/",
+                dict(DATES, guests=6),
+            ),
+            ("bookings-list", "/api/bookings/", {}),
+            ("users-list", "/api/users/", {}),
+            ("async-rooms-available", "/api/async/rooms/available/", DATES),
+        ],
+    )
+    def test_list_endpoints(self, assert_within_budget, endpoint, url, params):
+        response = self.client_for(self.user).get(url, params)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.wsgi_request.resolver_match.view_name == endpoint
+        assert_within_budget(response, **BUDGETS[endpoint])
+
+    def test_detail_endpoints(self, assert_within_budget):
+        client = self.client_for(self.user)
+
+        response = client.get(f"/api/rooms/{self.room.id}/")
+        assert_within_budget(response, **BUDGETS["rooms-detail"])
+        response = client.get(f"/api/bookings/{self.bookings[0].id}/")
+        assert_within_budget(response, **BUDGETS["bookings-detail"])
+
+    def test_staff_booking_list(self, assert_within_budget, admin_user):
+        response = self.client_for(admin_user).get("/api/bookings/")
+
+        assert len(response.data["results"]) == len(self.bookings)
+        assert_within_budget(response, **BUDGETS["bookings-list"])
+
+    def test_async_bookings(self, assert_within_budget):
+        client = APIClient()
+        token = RefreshToken.for_user(self.user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        response = client.get("/api/async/bookings/")
+
+        assert len(response.json()["results"]) == len(self.bookings)
+        assert_within_budget(response, **BUDGETS["async-bookings-list"])
+
+    def test_async_handler_counts_queries(self):
+        # Под ASGI middleware асинхронный; ORM идёт в потоке sync_to_async,
+        # и его запросы тоже должны попасть в счётчик
+        async def get_response(request):
+            pass
+
+        assert iscoroutinefunction(RequestMetricsMiddleware(get_response))
+        client = AsyncClient()
+
+        response = async_to_sync(client.get)("/api/async/rooms/available/", DATES)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.metrics["queries"] == 1
+
+        response = async_to_sync(client.get)("/api/rooms/", DATES)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.metrics["queries"] == 1
+        assert response.metrics["response_bytes"] == len(response.content)
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        response = APIClient().get("/api/rooms/")
+
+        assert response["X-DB-Queries"] == "1"
+        assert int(response["X-Response-Bytes"]) == len(response.content)
+        assert response["Server-Timing"].startswith("db;dur=")
+
+    def test_metrics_endpoint(self):
+        metrics.reset()
+        client = APIClient()
+        client.get("/api/rooms/")
+        client.get("/api/rooms/")
+
+        response = client.get("/api/metrics/")
+
+        assert response.status_code == status.HTTP_200_OK
+        body = response.content.decode()
+        assert (
+            'rooms_requests_total{endpoint="rooms-list",method="GET",status="200"} 2'
+            in body
+        )
+        assert (
+            'rooms_db_queries_bucket{endpoint="rooms-list",method="GET",le="1"} 2'
+            in body
+        )
+        # Второй ответ пришёл из кэша, без запросов к базе
+        assert 'rooms_db_queries_sum{endpoint="rooms-list",method="GET"} 1' in body
+        assert 'rooms_db_queries_count{endpoint="rooms-list",method="GET"} 2' in body
+
+        with override_settings(METRICS_TOKEN="secret"):
+            assert client.get("/api/metrics/").status_code == 403
+            client.credentials(HTTP_AUTHORIZATION="Bearer secret")
+            assert client.get("/api/metrics/").status_code == 200
+
+
+@pytest.mark.django_db
+class TestRowListFastPath:
+
+    def setup_method(self, method):
+        self.user = MyUser.objects.create_user(
+            username="rows", email="rows@example.com", password="password"
+        )
+        self.room = Room.objects.create(
+            name=401, price_per_day="99.50", capacity=2, room_type="suite"
+        )
+        Booking.objects.create(
+            user=self.user,
+            room=self.room,
+            start_date=datetime.date(2024, 7, 5),
+            end_date=datetime.date(2024, 7, 7),
+        )
+        # cost=None отдаётся как null, как и у ModelSerializer
+        Booking.objects.bulk_create(
+            [
+                Booking(
+                    user=self.user,
+                    room=self.room,
+                    start_date=datetime.date(2024, 8, 1),
+                    end_date=datetime.date(2024, 8, 2),
+                )
+            ]
+        )
+
+    def test_same_wire_format_as_model_serializer(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        for url, queryset, serializer_class in (
+            ("/api/rooms/", Room.objects.order_by("id"), RoomSerializer),
+            (
+                "/api/bookings/",
+                Booking.objects.order_by("start_date"),
+                BookingSerializer,
+            ),
+        ):
+            response = client.get(url)
+            expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+            assert response.content.startswith(b'{"next":null,"previous":null,')
+            assert response.content.endswith(b'"results":' + expected + b"}")
+
+    def test_orjson_renderer_matches_json_renderer(self):
+        data = {
+            "text": "caf\u00e9 line\u2028separator",
+            "cost": Decimal("1.50"),
+            "when": datetime.datetime(2024, 7, 5, 12, 0, tzinfo=datetime.timezone.utc),
+            "day": datetime.date(2024, 7, 5),
+            1: [None, True],
+        }
+
+        assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+@pytest.mark.django_db
+class TestBookingAdmin:
+
+    def test_overlapping_booking_is_a_form_error(self, admin_user, client):
+        room = Room.objects.create(name=601, price_per_day=100, capacity=2)
+        Booking.objects.create(
+            user=admin_user,
+            room=room,
+            start_date=datetime.date(2024, 7, 1),
+            end_date=datetime.date(2024, 7, 5),
+        )
+        client.force_login(admin_user)
+        data = {
+            "user": admin_user.id,
+            "room": room.id,
+            "start_date": "2024-07-03",
+            "end_date": "2024-07-06",
+            "cost": "",
+        }
+
+        response = client.post("/admin/rooms/booking/add/", data)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert ROOM_ALREADY_BOOKED in response.content.decode()
+        assert Booking.objects.count() == 1
+
+        data.update(start_date="2024-07-05", end_date="2024-07-07")
+        response = client.post("/admin/rooms/booking/add/", data)
+        assert response.status_code == status.HTTP_302_FOUND
+        assert Booking.objects.count() == 2
+
+
+@pytest.mark.django_db
+class TestHoldApi:
+
+    def setup_method(self, method):
+        self.room = Room.objects.create(name=501, capacity=2, price_per_day=100)
+        self.stay = {
+            "room": self.room.id,
+            "start_date": "2024-07-05",
+            "end_date": "2024-07-08",
+        }
+        self.clients = []
+        for name in ("first", "second"):
+            user = MyUser.objects.create_user(
+                username=name, email=f"{name}@example.com", password="password"
+            )
+            client = APIClient()
+            client.force_authenticate(user=user)
+            self.clients.append((user, client))
+
+    def test_hold_and_confirm(self):
+        user, client = self.clients[0]
+
+        response = client.post("/api/holds/", self.stay, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        hold_id = response.data["id"]
+        assert client.get(f"/api/holds/{hold_id}/").data["room"] == self.room.id
+
+        response = client.post(f"/api/holds/{hold_id}/confirm/")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        booking = Booking.objects.get(id=response.data["id"])
+        assert (booking.user, booking.room) == (user, self.room)
+        assert booking.cost == 300
+        assert client.get(f"/api/holds/{hold_id}/").status_code == 404
+
+    def test_contended_room_is_decided_by_hold(self):
+        (_, winner), (loser_user, loser) = self.clients
+        hold_id = winner.post("/api/holds/", self.stay, format="json").data["id"]
+
+        overlapping = dict(self.stay, start_date="2024-07-07", end_date="2024-07-09")
+        response = loser.post("/api/holds/", overlapping, format="json")
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+        response = loser.post(
+            "/api/bookings/", dict(overlapping, user=loser_user.id), format="json"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "on hold" in str(response.data)
+        # Чужой холд нельзя ни посмотреть, ни подтвердить
+        assert loser.post(f"/api/holds/{hold_id}/confirm/").status_code == 404
+
+        # Соседние ночи свободны, а после отмены холда — и эти
+        after = dict(self.stay, start_date="2024-07-08", end_date="2024-07-10")
+        assert loser.post("/api/holds/", after, format="json").status_code == 201
+        assert winner.delete(f"/api/holds/{hold_id}/").status_code == 204
+        before = dict(self.stay, start_date="2024-07-01", end_date="2024-07-08")
+        assert loser.post("/api/holds/", before, format="json").status_code == 201
+
+    def test_hold_on_booked_dates(self):
+        user, client = self.clients[0]
+        Booking.objects.create(
+            user=user,
+            room=self.room,
+            start_date=datetime.date(2024, 7, 6),
+            end_date=datetime.date(2024, 7, 7),
+        )
+
+        response = client.post("/api/holds/", self.stay, format="json")
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+
+@pytest.mark.django_db
+class TestClaimsAuthentication:
+
+    def setup_method(self, method):
+        self.user = MyUser.objects.create_user(
+            username="claims", email="claims@example.com", password="password"
+        )
+        self.staff = MyUser.objects.create_user(
+            username="staff",
+            email="staff@example.com",
+            password="password",
+            is_staff=True,
+        )
+        room = Room.objects.create(name=601, capacity=2, price_per_day=100)
+        self.booking = Booking.objects.create(
+            user=self.staff,
+            room=room,
+            start_date=datetime.date(2024, 7, 5),
+            end_date=datetime.date(2024, 7, 6),
+        )
+
+    def client_for(self, username):
+        client = APIClient()
+        response = client.post(
+            "/api/token/", {"username": username, "password": "password"}
+        )
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return client
+
+    def test_get_needs_no_user_query(self, django_assert_num_queries):
+        user_client = self.client_for("claims")
+        staff_client = self.client_for("staff")
+
+        # Единственный запрос — сами брони
+        with django_assert_num_queries(1):
+            response = user_client.get("/api/bookings/")
+        assert response.data["results"] == []
+        with django_assert_num_queries(1):
+            response = staff_client.get("/api/bookings/")
+        assert [b["id"] for b in response.data["results"]] == [self.booking.id]
+
+        response = user_client.get(f"/api/bookings/{self.booking.id}/")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @override_settings(ROOMS_AUTH_USER_CACHE_TTL=60)
+    def test_cached_user_row_is_invalidated(self, django_assert_num_queries):
+        client = self.client_for("claims")
+        with django_assert_num_queries(2):
+            client.get("/api/bookings/")
+        with django_assert_num_queries(1):
+            client.get("/api/bookings/")
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = client.get("/api/bookings/")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestBookingArchive:
+
+    def setup_method(self, method):
+        self.user = MyUser.objects.create_user(
+            username="archive", email="archive@example.com", password="password"
+        )
+        self.other = MyUser.objects.create_user(
+            username="other", email="other@example.com", password="password"
+        )
+        self.room = Room.objects.create(name=701, capacity=2, price_per_day=100)
+        self.past, self.current = (
+            Booking.objects.create(
+                user=self.user,
+                room=self.room,
+                start_date=datetime.date(2024, month, 1),
+                end_date=datetime.date(2024, month, 5),
+            )
+            for month in (1, 7)
+        )
+        Booking.objects.create(
+            user=self.other,
+            room=self.room,
+            start_date=datetime.date(2024, 2, 1),
+            end_date=datetime.date(2024, 2, 3),
+        )
+
+    def test_archive_moves_completed_stays(self):
+        call_command("archive_bookings", "--before=2024-06-30", "--chunk-size=1")
+
+        assert list(Booking.objects.values_list("id", flat=True)) == [self.current.id]
+        archived = BookingArchive.objects.get(id=self.past.id)
+        assert (archived.user, archived.cost) == (self.user, self.past.cost)
+        # Архивные ночи больше не держат комнату, карта занятости сходится
+        assert occupancy.verify() == []
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get("/api/bookings/history/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [b["id"] for b in response.data["results"]] == [self.past.id]
+        assert response.data["results"][0]["start_date"] == "2024-01-01"
+        assert [b["id"] for b in client.get("/api/bookings/").data["results"]] == [
+            self.current.id
+        ]
+
+    def test_archive_rejects_future_dates(self):
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+
+        with pytest.raises(CommandError):
+            call_command("archive_bookings", f"--before={tomorrow}")
+        with pytest.raises(CommandError):
+            call_command("archive_bookings", "--keep-days=-1")
+        with pytest.raises(ValueError):
+            archive_chunk(tomorrow, 100)
+        assert Booking.objects.count() == 3
+
+    def test_history_requires_authentication(self):
+        response = APIClient().get("/api/bookings/history/")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestIdempotencyKeys:
+
+    def setup_method(self, method):
+        self.user = MyUser.objects.create_user(
+            username="mobile", email="mobile@example.com", password="password"
+        )
+        self.room = Room.objects.create(name=601, capacity=2, price_per_day=100)
+        self.data = {
+            "user": self.user.id,
+            "room": self.room.id,
+            "start_date": "2024-07-05",
+            "end_date": "2024-07-08",
+        }
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def post(self, data, key="retry-1"):
+        return self.client.post(
+            "/api/bookings/", data, format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_first_response(self, django_assert_num_queries):
+        first = self.post(self.data)
+        assert first.status_code == status.HTTP_201_CREATED
+
+        # Повтор — одно чтение ключа, без проверки пересечений и вставки
+        with django_assert_num_queries(1):
+            retry = self.post(self.data)
+
+        assert retry.status_code == status.HTTP_201_CREATED
+        assert retry["Idempotent-Replayed"] == "true"
+        assert retry.json() == first.json()
+        assert Booking.objects.count() == 1
+
+        # Другой ключ — обычная обработка и отказ из-за пересечения
+        assert self.post(self.data, key="retry-2").status_code == 400
+
+    def test_key_reused_for_other_request(self):
+        self.post(self.data)
+
+        response = self.post(dict(self.data, end_date="2024-07-09"))
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_in_flight_duplicate(self):
+        IdempotencyKey.objects.create(user=self.user, key="retry-1", fingerprint="")
+        response = self.post(self.data)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+        IdempotencyKey.objects.all().delete()
+        duplicates = []
+        perform_create = BookingViewSet.perform_create
+
+        def slow_create(view, serializer):
+            # Дубль приходит, пока первый запрос ещё выполняется
+            duplicates.append(self.post(self.data))
+            perform_create(view, serializer)
+
+        with mock.patch.object(BookingViewSet, "perform_create", slow_create):
+            first = self.post(self.data)
+
+        assert first.status_code == status.HTTP_201_CREATED
+        assert duplicates[0].status_code == status.HTTP_409_CONFLICT
+        assert duplicates[0]["Retry-After"] == "1"
+        assert Booking.objects.count() == 1
+
+    def test_failed_request_frees_key(self):
+        response = self.post(dict(self.data, user=self.user.id + 1000))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not IdempotencyKey.objects.exists()
+
+        assert self.post(self.data).status_code == status.HTTP_201_CREATED
+
+    @override_settings(ROOMS_IDEMPOTENCY_TTL=60)
+    def test_expired_keys(self):
+        self.post(self.data)
+        IdempotencyKey.objects.update(
+            created_at=timezone.now() - datetime.timedelta(minutes=5)
+        )
+
+        # Истёкший ключ не воспроизводится, запрос выполняется заново
+        response = self.post(
+            dict(self.data, start_date="2024-07-10", end_date="2024-07-12")
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Booking.objects.count() == 2
+
+        IdempotencyKey.objects.update(
+            created_at=timezone.now() - datetime.timedelta(minutes=5)
+        )
+        call_command("purge_idempotency_keys")
+        assert not IdempotencyKey.objects.exists()
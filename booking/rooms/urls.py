@@ -1,12 +1,19 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RoomViewSet, BookingViewSet, UserViewSet
+from . import async_views, metrics
+from .views import RoomViewSet, BookingViewSet, HoldViewSet, UserViewSet
 
 router = DefaultRouter()
 router.register(r'rooms', RoomViewSet, basename='rooms')
 router.register(r'bookings', BookingViewSet, basename='bookings')
 router.register(r'users', UserViewSet, basename='users')
+router.register(r'holds', HoldViewSet, basename='holds')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/rooms/', async_views.room_list, name='async-rooms-list'),
+    path('async/rooms/available/', async_views.room_availability, name='async-rooms-available'),
+    path('async/rooms/<int:pk>/', async_views.room_detail, name='async-rooms-detail'),
+    path('async/bookings/', async_views.my_bookings, name='async-bookings-list'),
+    path('metrics/', metrics.metrics_view, name='metrics'),
 ]
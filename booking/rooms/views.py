@@ -1,17 +1,48 @@
+import heapq
+from datetime import timedelta
+
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.filters import OrderingFilter
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
 
+from . import availability, cache, exports, holds, idempotency, packing, pricing, search
 from .filters import RoomFilter
-from .models import Booking, MyUser, Room
+from .models import Booking, BookingArchive, MyUser, Room
+from .pagination import (
+    BookingCursorPagination,
+    RoomCursorPagination,
+    UserCursorPagination,
+)
 from .permissons import AdminOnlyPermission, IsOwner, IsOwnerOrStaff
-from .serializers import BookingSerializer, MyUserSerializer, RoomSerializer
+from .rows import RowListMixin, RowSerializer
+from .serializers import (
+    BookingArchiveSerializer,
+    BookingSerializer,
+    BulkBookingSerializer,
+    CalendarQuerySerializer,
+    FlexibleSearchQuerySerializer,
+    GroupCombinationSerializer,
+    GroupSearchQuerySerializer,
+    HoldSerializer,
+    MyUserSerializer,
+    QuoteSerializer,
+    RoomQuoteSerializer,
+    RoomSearchQuerySerializer,
+    RoomSerializer,
+    StayWindowSerializer,
+)
 
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = MyUser.objects.all()
     serializer_class = MyUserSerializer
     permission_classes = [IsOwner]
+    pagination_class = UserCursorPagination
 
     def get_queryset(self):
         user = self.request.user
@@ -20,7 +51,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return MyUser.objects.filter(id=user.id)
 
 
-class RoomViewSet(viewsets.ModelViewSet):
+class RoomViewSet(RowListMixin, viewsets.ModelViewSet):
     queryset = Room.objects.all()
     serializer_class = RoomSerializer
 
@@ -28,20 +59,354 @@ class RoomViewSet(viewsets.ModelViewSet):
     filterset_class = RoomFilter
     filterset_fields = ["price_per_day", "capacity"]
     ordering_fields = ["price_per_day", "capacity"]
+    ordering = ["id"]
+    pagination_class = RoomCursorPagination
 
     permission_classes = [AdminOnlyPermission]
 
+    def list(self, request, *args, **kwargs):
+        return cache.cached_response(
+            request,
+            "list",
+            lambda: super(RoomViewSet, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return cache.cached_response(
+            request,
+            "detail",
+            lambda: super(RoomViewSet, self).retrieve(request, *args, **kwargs),
+        )
+
+    def filter_rooms(self, params):
+        # Как DjangoFilterBackend: неверное значение фильтра — 400, а не
+        # молча пропущенное условие
+        filterset = RoomFilter(
+            params, queryset=Room.objects.all(), request=self.request
+        )
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        return filterset.qs
+
+    @action(detail=False, methods=["get"])
+    def calendar(self, request):
+        query = CalendarQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        start_date = query.validated_data["start_date"]
+        end_date = query.validated_data["end_date"]
+        days = (end_date - start_date).days
+
+        # Даты здесь задают окно календаря, а не отбор свободных комнат
+        params = request.query_params.copy()
+        params.pop("start_date", None)
+        params.pop("end_date", None)
+        rooms = list(self.filter_rooms(params).order_by("id").values("id", "name"))
+        bitsets = availability.occupancy_bitsets(
+            [room["id"] for room in rooms], start_date, end_date
+        )
+
+        encoding = query.validated_data["encoding"]
+        for room in rooms:
+            bits = bitsets[room["id"]]
+            if encoding == "bitmap":
+                room["booked"] = availability.bits_to_bitmap(bits, days)
+            else:
+                room["booked"] = availability.bits_to_spans(bits)
+
+        return Response(
+            {
+                "start_date": start_date,
+                "end_date": end_date,
+                "days": days,
+                "encoding": encoding,
+                "rooms": rooms,
+            }
+        )
+
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        query = RoomSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        start_date = query.validated_data["start_date"]
+        end_date = query.validated_data["end_date"]
+
+        # Свободные комнаты — тем же RoomFilter, цены — одним пакетным расчётом
+        rooms = list(self.filter_rooms(request.query_params))
+        nights = (end_date - start_date).days
+        costs = pricing.quote_many([(room, start_date, end_date) for room in rooms])
+        for room, cost in zip(rooms, costs):
+            room.nights = nights
+            room.total_cost = cost
+
+        rooms.sort(key=lambda room: room.id)
+        for field in reversed(query.validated_data["ordering"]):
+            rooms.sort(
+                key=lambda room: getattr(room, field.lstrip("-")),
+                reverse=field.startswith("-"),
+            )
+        return Response(RoomQuoteSerializer(rooms, many=True).data)
+
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        # Страница комнат, как в списке, и счётчики фасетов по тем же фильтрам
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = RowSerializer.for_serializer(RoomSerializer)
+        page = self.paginate_queryset(queryset.values(*rows.sources))
+        response = self.get_paginated_response(rows.many(page))
+
+        if any(request.query_params.get(name) for name in cache.DATE_PARAMS):
+            counts = search.facet_counts(queryset)
+        else:
+            # Без дат счётчики зависят только от каталога: кэшируем, не
+            # различая страницы и сортировку
+            params = request.query_params.copy()
+            for name in ("cursor", "page_size", "ordering"):
+                params.pop(name, None)
+            counts = cache.cached_value(
+                "facets", params, lambda: search.facet_counts(queryset)
+            )
+        response.data["facets"] = counts
+        return response
+
+    @action(detail=False, methods=["get"])
+    def flexible(self, request):
+        query = FlexibleSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        start_date = query.validated_data["start_date"]
+        end_date = query.validated_data["end_date"]
+        nights = query.validated_data["nights"]
+        days = (end_date - start_date).days
+
+        # Даты задают диапазон поиска, свободные окна ищутся по карте
+        # занятости всего диапазона одним запросом
+        params = request.query_params.copy()
+        params.pop("start_date", None)
+        params.pop("end_date", None)
+        rooms = list(
+            self.filter_rooms(params).order_by("id").only(*RoomSerializer.Meta.fields)
+        )
+        bitsets = availability.occupancy_bitsets(
+            [room.id for room in rooms], start_date, end_date
+        )
+        windows = [
+            (room, i)
+            for room in rooms
+            for i in availability.iter_bits(
+                availability.free_starts(bitsets[room.id], days, nights)
+            )
+        ]
+        costs = pricing.quote_windows(windows, start_date, end_date, nights)
+
+        best = heapq.nsmallest(
+            query.validated_data["limit"],
+            zip(costs, range(len(windows))),
+        )
+        results = []
+        for cost, index in best:
+            room, i = windows[index]
+            stay_start = start_date + timedelta(days=i)
+            results.append(
+                {
+                    "room": room,
+                    "start_date": stay_start,
+                    "end_date": stay_start + timedelta(days=nights),
+                    "total_cost": cost,
+                }
+            )
+        return Response(
+            {
+                "start_date": start_date,
+                "end_date": end_date,
+                "nights": nights,
+                "windows": StayWindowSerializer(results, many=True).data,
+            }
+        )
+
+    @action(detail=False, methods=["get"], url_path="group-search")
+    def group_search(self, request):
+        query = GroupSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        start_date = params["start_date"]
+        end_date = params["end_date"]
+
+        # Один снимок свободных комнат; вместимость отдельной комнаты здесь
+        # не фильтр — её покрывает подбор
+        filters = request.query_params.copy()
+        filters.pop("capacity", None)
+        rooms = list(
+            self.filter_rooms(filters).order_by().only(*RoomSerializer.Meta.fields)
+        )
+        nights = (end_date - start_date).days
+        costs = pricing.quote_many([(room, start_date, end_date) for room in rooms])
+        for room, cost in zip(rooms, costs):
+            room.nights = nights
+            room.total_cost = cost
+
+        combinations = [
+            {
+                "rooms": combination,
+                "capacity": sum(room.capacity for room in combination),
+                "total_cost": sum(room.total_cost for room in combination),
+            }
+            for combination in packing.pack(
+                rooms,
+                params["guests"],
+                limit=params["limit"],
+                objective=params["objective"],
+                max_rooms=params.get("max_rooms"),
+            )
+        ]
+        return Response(
+            {
+                "start_date": start_date,
+                "end_date": end_date,
+                "guests": params["guests"],
+                "combinations": GroupCombinationSerializer(
+                    combinations, many=True
+                ).data,
+            }
+        )
 
-class BookingViewSet(viewsets.ModelViewSet):
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[AllowAny],
+        serializer_class=QuoteSerializer,
+    )
+    def quote(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="cache-stats",
+        permission_classes=[IsAdminUser],
+    )
+    def cache_stats(self, request):
+        return Response(cache.stats())
+
+
+class BookingViewSet(RowListMixin, viewsets.ModelViewSet):
     queryset = Booking.objects.all().select_related("user", "room")
     serializer_class = BookingSerializer
     permission_classes = [IsOwnerOrStaff]
+    # Только поля без NULL: по ним строится keyset-курсор
+    ordering_fields = ["start_date", "end_date"]
+    pagination_class = BookingCursorPagination
 
     def get_queryset(self):
+        return self.get_scoped_queryset().select_related("user", "room")
+
+    def create(self, request, *args, **kwargs):
+        # Повтор с тем же Idempotency-Key получает первый ответ
+        return idempotency.respond(
+            request,
+            lambda: super(BookingViewSet, self).create(request, *args, **kwargs),
+        )
+
+    def get_scoped_queryset(self, model=Booking):
         user = self.request.user
         if user.is_staff:
-            return Booking.objects.all().select_related("user", "room")
-        return Booking.objects.filter(user=user.id).select_related("user", "room")
+            return model.objects.all()
+        return model.objects.filter(user=user.id)
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
+    def history(self, request):
+        # Брони, перенесённые archive_bookings; пагинация та же, что у списка
+        rows = RowSerializer.for_serializer(BookingArchiveSerializer)
+        queryset = self.get_scoped_queryset(BookingArchive).values(*rows.sources)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(rows.many(page))
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
+    def export(self, request):
+        fmt = request.query_params.get("fmt", "csv")
+        if fmt not in exports.FORMATS:
+            return Response(
+                {"fmt": [f"Unsupported export format: {fmt}"]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        stream, content_type, extension = exports.FORMATS[fmt]
+        response = StreamingHttpResponse(
+            stream(self.get_scoped_queryset()), content_type=content_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="bookings.{extension}"'
+        return response
+
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[IsAuthenticated],
+        serializer_class=BulkBookingSerializer,
+    )
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+
+        created = sum(result["status"] == "created" for result in results)
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({"results": results}, status=response_status)
+
+
+class HoldViewSet(viewsets.ViewSet):
+    # Холд решает, кому достанется комната, до вставки в базу;
+    # подтверждение превращает его в обычную бронь
+    permission_classes = [IsAuthenticated]
+
+    def create(self, request):
+        serializer = HoldSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            hold = holds.place(
+                request.user.id,
+                serializer.validated_data["room"],
+                serializer.validated_data["start_date"],
+                serializer.validated_data["end_date"],
+            )
+        except holds.HoldConflict as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(HoldSerializer(hold).data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        return Response(HoldSerializer(self.get_hold(request, pk)).data)
+
+    def destroy(self, request, pk=None):
+        holds.release(self.get_hold(request, pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=["post"])
+    def confirm(self, request, pk=None):
+        hold = self.get_hold(request, pk)
+        serializer = BookingSerializer(
+            data={
+                "user": request.user.id,
+                "room": hold["room"],
+                "start_date": hold["start_date"],
+                "end_date": hold["end_date"],
+            },
+            context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        holds.release(hold)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def get_hold(self, request, pk):
+        hold = holds.get(pk)
+        # Истёкший и чужой холд для пользователя выглядят одинаково
+        if hold is None or hold["user"] != request.user.id:
+            raise NotFound()
+        return hold
 
 
 # Про метод cancel